@@ -0,0 +1,259 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end throughput of RowProcessor against a local fixture server, with
+no internet access needed:
+
+    python benchmarks/bench_e2e.py [--sites 40] [--repeat 3] [--save-baseline]
+
+The server generates sites with many <img>/srcset tags, heavy external CSS
+with @import, extensionless CDN images, a slow host and an erroring host,
+and large and too-small images. Rows run through the real fetch / parse /
+download / dedup path on the shared NetworkLayer session; the Selenium
+fallback is replaced by a no-op, since it needs a browser. The per-row cap
+defaults to above what a site offers, so every run does the same work
+regardless of timing. Reports the median over the repeats of rows/s,
+images/s, bytes wasted on rejected images and p50/p95 row latency, and
+compares them with benchmarks/baseline_e2e.json when it exists.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import logging
+import statistics
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aiohttp import web
+from PIL import Image
+import processor_core
+import css_fetcher
+from processor_core import RowProcessor
+from config_manager import load_config
+from network import NetworkLayer
+from retry import configure_retry
+from fetcher import configure_cache
+from postprocess import configure_postprocess
+from metrics import configure_metrics, shutdown_metrics, get_metrics
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_e2e.json')
+PORT     = 8791
+# the slow and erroring hosts get their own loopback address (and so their
+# own throttle bucket and circuit breaker) where the OS allows it
+HOSTS    = {'main': '127.0.0.1', 'slow': '127.0.0.2', 'err': '127.0.0.3'}
+SLOW_DELAY = 0.2
+CSS_FILLER = 1500
+# higher is better for these; lower for the rest
+HIGHER_IS_BETTER = ('rows_per_s', 'images_per_s')
+
+def _image(rng, size, fmt):
+    # 8x8 random blocks scaled up: distinct hashes and dHashes, cheap to encode
+    small = Image.new('RGB', (8, 8))
+    small.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(64)])
+    buf = io.BytesIO()
+    small.resize(size, Image.NEAREST).save(buf, fmt, quality=85)
+    return buf.getvalue()
+
+class Fixture:
+    """Deterministic synthetic sites; every image is generated before timing starts."""
+    def __init__(self, sites, seed=1):
+        self.rng    = random.Random(seed)
+        self.sites  = sites
+        self.images = {}
+        self.pages  = {}
+        self.css    = {}
+
+    def url(self, host, path):
+        return f'http://{HOSTS[host]}:{PORT}{path}'
+
+    def _add(self, key, size, fmt='JPEG'):
+        self.images[key] = (_image(self.rng, size, fmt), f'image/{fmt.lower()}')
+        return key
+
+    def build(self):
+        large = [self._add(f'L{k}', (3000, 2000)) for k in range(4)]
+        small = [self._add(f's{k}', (self.rng.randrange(40, 200),) * 2, 'PNG') for k in range(8)]
+        for s in range(self.sites):
+            size = lambda: (self.rng.randrange(300, 900), self.rng.randrange(300, 900))
+            tags = []
+            for k in range(12):
+                key = self._add(f'{s}_{k}', size())
+                sset = ', '.join(f"{self.url('main', f'/img/{key}-{w}.jpg')} {w}w" for w in (320, 640, 1280))
+                tags.append(f'<img src="{self.url("main", f"/img/{key}-320.jpg")}" srcset="{sset}">')
+            for key in small[:3]:
+                tags.append(f'<img src="{self.url("main", f"/img/{key}.png")}">')
+            tags.append(f'<img src="{self.url("main", f"/img/{large[s % 4]}.jpg")}">')
+            for k in range(4):
+                key = self._add(f'{s}_cdn{k}', size())
+                tags.append(f'<img src="{self.url("main", f"/cdn/{key}")}">')
+            for host in ('slow', 'err'):
+                for k in range(3):
+                    key = self._add(f'{s}_{host}{k}', size())
+                    tags.append(f'<img src="{self.url(host, f"/{host}/img/{key}.jpg")}">')
+            # interleaved, so slow / failing / rejected images compete with good ones
+            self.rng.shuffle(tags)
+
+            bgs = [self._add(f'{s}_bg{k}', size()) for k in range(4)]
+            filler = ''.join(f'.c{s}_{r}{{margin:{r % 7}px;color:#{r % 4096:03x}}}\n'
+                             for r in range(CSS_FILLER))
+            self.css[f'{s}_a'] = (f'@import url("{s}_b.css");\n' + filler +
+                ''.join(f'.bg{k}{{background:url(/img/{key}.jpg)}}\n' for k, key in enumerate(bgs[:2])))
+            self.css[f'{s}_b'] = filler + ''.join(
+                f'.bg{k}{{background-image:url("/img/{key}.jpg")}}\n' for k, key in enumerate(bgs[2:]))
+
+            self.pages[s] = (
+                f'<html><head><link rel="stylesheet" href="/css/{s}_a.css"></head><body>'
+                + ''.join(f'<div class="card">{t}<p>item</p></div>' for t in tags)
+                + '</body></html>'
+            )
+
+    async def handle(self, request):
+        path = request.path
+        if path.startswith('/slow/'):
+            await asyncio.sleep(SLOW_DELAY)
+            path = path[5:]
+        elif path.startswith('/err/'):
+            n = sum(map(ord, path)) % 3
+            if n == 0:
+                return web.Response(status=503)
+            if n == 1:
+                return web.Response(status=404)
+            path = path[4:]
+        kind, _, name = path.strip('/').partition('/')
+        if kind == 'site':
+            return web.Response(text=self.pages[int(name)], content_type='text/html')
+        if kind == 'css':
+            return web.Response(text=self.css[name[:-4]], content_type='text/css')
+        if kind in ('img', 'cdn'):
+            key = os.path.splitext(name)[0]
+            key = key.rsplit('-', 1)[0] if key not in self.images else key
+            body, ctype = self.images[key]
+            return web.Response(body=body, content_type=ctype)
+        return web.Response(status=404)
+
+async def _serve(fixture):
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', fixture.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    for name, addr in list(HOSTS.items()):
+        try:
+            await web.TCPSite(runner, addr, PORT).start()
+        except OSError:
+            HOSTS[name] = HOSTS['main']
+    return runner
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+async def run(args):
+    cfg = load_config()
+    tmp = tempfile.mkdtemp(prefix='bench_e2e_')
+    cfg.update(
+        output_dir=tmp, metrics_stream=None, metrics_prom=None, profile_slow_rows=None,
+        postprocess_workers=0, host_rate=args.host_rate, host_burst=args.host_rate,
+        max_images_per_site=args.max_images,
+    )
+    # a fresh run: no stylesheets parsed by an earlier repeat, same backoff jitter
+    css_fetcher._sheets.clear()
+    random.seed(0)
+    configure_retry(cfg)
+    configure_cache(None, 0)
+    configure_postprocess(cfg)
+    configure_metrics(cfg)
+    # no browser here; rows that run short of images simply end
+    processor_core.fetch_all_images_with_selenium = lambda *a, **k: []
+
+    fixture = Fixture(args.sites)
+    fixture.build()
+    runner = await _serve(fixture)
+    row_sem = asyncio.Semaphore(cfg['row_concurrency'])
+    download_sem = asyncio.Semaphore(cfg['global_download_concurrency'])
+    latencies, rows = [], []
+
+    async def _row(session, s):
+        async with row_sem:
+            t0 = time.perf_counter()
+            rp = RowProcessor(session, s, 'Bench', s, fixture.url('main', f'/site/{s}/'),
+                              cfg, [], download_sem=download_sem)
+            await rp.run()
+            latencies.append(time.perf_counter() - t0)
+            rows.append(rp)
+
+    try:
+        async with NetworkLayer(cfg).session() as session:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(_row(session, s) for s in range(args.sites)))
+            wall = time.perf_counter() - t0
+    finally:
+        await runner.cleanup()
+
+    kept = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+    downloaded = get_metrics().stage_bytes.get('download', 0)
+    images = sum(rp.success for rp in rows)
+    shutdown_metrics()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        'rows': len(rows),
+        'images': images,
+        'rows_per_s': len(rows) / wall,
+        'images_per_s': images / wall,
+        'wasted_mb': (downloaded - kept) / 1e6,
+        'p50_row_s': _percentile(latencies, 50),
+        'p95_row_s': _percentile(latencies, 95),
+        'wall_s': wall,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sites', type=int, default=40)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--max-images', type=int, default=100,
+                    help='max_images_per_site; below ~20 the quota makes runs timing-dependent')
+    ap.add_argument('--host-rate', type=float, default=1000.0,
+                    help='per-host requests/sec (the fixture is local, so not the real politeness limit)')
+    ap.add_argument('--save-baseline', action='store_true')
+    ap.add_argument('--tolerance', type=float, default=10.0,
+                    help='percent change that counts as a regression')
+    args = ap.parse_args()
+
+    # expected 404/503s from the erroring host would flood the output
+    logging.disable(logging.WARNING)
+    runs = [asyncio.run(run(args)) for _ in range(args.repeat)]
+    result = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+
+    for k, v in result.items():
+        print(f"{k:>13}: {v:.3f}" if isinstance(v, float) else f"{k:>13}: {v}")
+
+    if args.save_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline saved to {BASELINE}")
+        return
+    if not os.path.exists(BASELINE):
+        print("no baseline yet (run with --save-baseline)")
+        return
+    with open(BASELINE) as f:
+        base = json.load(f)
+    regressed = []
+    print("\nvs. baseline:")
+    for k in ('rows_per_s', 'images_per_s', 'wasted_mb', 'p50_row_s', 'p95_row_s'):
+        if not base.get(k):
+            continue
+        change = (result[k] - base[k]) / base[k] * 100
+        worse = -change if k in HIGHER_IS_BETTER else change
+        flag = '  REGRESSION' if worse > args.tolerance else ''
+        print(f"{k:>13}: {base[k]:.3f} -> {result[k]:.3f} ({change:+.1f}%){flag}")
+        if flag:
+            regressed.append(k)
+    if regressed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_parser.py
+"""
+Compares the single-pass lxml extractor with the multi-pass BeautifulSoup
+walker on a corpus of saved pages:
+
+    python benchmarks/bench_parser.py path/to/saved_pages [--repeat 5]
+
+Every *.html / *.htm file under the directory is parsed by both; results
+must match (the script reports any page where they don't). Without a
+directory a synthetic corpus is generated.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parser import _extract_bs4, _extract_lxml, etree
+
+BASE = 'https://example.com/'
+
+def synthetic_corpus(n=40):
+    pages = []
+    for p in range(n):
+        parts = ['<html><head>']
+        parts += [f'<link rel="stylesheet" href="/css/{p}_{i}.css">' for i in range(10)]
+        parts.append('</head><body>')
+        for i in range(300):
+            parts.append(
+                f'<div class="card" style="background:url(https://cdn.example.com/bg/{p}_{i}.jpg)">'
+                f'<picture><source srcset="https://cdn.example.com/{p}/{i}.webp 1x, '
+                f'https://cdn.example.com/{p}/{i}@2x.webp 2x"></picture>'
+                f'<img src="https://cdn.example.com/{p}/{i}.jpg" '
+                f'srcset="https://cdn.example.com/{p}/{i}-320.jpg 320w, https://cdn.example.com/{p}/{i}-640.jpg 640w" '
+                f'data-src="https://cdn.example.com/{p}/{i}-lazy.png" alt="x"><p>text {i}</p></div>'
+            )
+        parts.append('</body></html>')
+        pages.append((f'synthetic_{p}.html', ''.join(parts)))
+    return pages
+
+def load_corpus(root):
+    pages = []
+    for dirpath, _, files in os.walk(root):
+        for fn in files:
+            if fn.lower().endswith(('.html', '.htm')):
+                with open(os.path.join(dirpath, fn), encoding='utf-8', errors='replace') as f:
+                    pages.append((fn, f.read()))
+    return pages
+
+def bench(fn, pages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, html in pages:
+            fn(html, BASE)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('corpus', nargs='?')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    if etree is None:
+        sys.exit('lxml is not installed')
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not pages:
+        sys.exit('no pages found')
+
+    mismatches = [name for name, html in pages
+                  if _extract_bs4(html, BASE) != _extract_lxml(html, BASE)]
+
+    mb = sum(len(h) for _, h in pages) / 1e6
+    old = bench(_extract_bs4, pages, args.repeat)
+    new = bench(_extract_lxml, pages, args.repeat)
+    print(f"{len(pages)} pages, {mb:.1f} MB")
+    print(f"bs4 (html.parser, multi-pass): {old:.3f}s  {mb / old:.1f} MB/s")
+    print(f"lxml (single pass):            {new:.3f}s  {mb / new:.1f} MB/s")
+    print(f"speedup: {old / new:.1f}x")
+    if mismatches:
+        print(f"{len(mismatches)} page(s) differ: {', '.join(mismatches[:10])}")
+
+if __name__ == '__main__':
+    main()
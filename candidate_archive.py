@@ -0,0 +1,143 @@
+# image_scraper/candidate_archive.py
+
+import os
+import mmap
+import time
+import sqlite3
+import threading
+
+class CandidateArchive:
+    """
+    Every candidate a row fetched, kept for offline reprocessing.
+      packs: append-only pack_<pid>_<n>.bin files holding each distinct
+             image body once (content-addressed by MD5), rolled at
+             `pack_bytes`; one writer per process, so workers never share
+             a pack.
+      index: SQLite; blobs (hash -> pack, offset, length) and candidates
+             (row, url, discovery stage, dimensions, hash, live outcome).
+    Reads map the packs with mmap, so reprocessing runs at disk speed.
+    """
+    def __init__(self, root, pack_bytes=256 * 1024 * 1024):
+        os.makedirs(root, exist_ok=True)
+        self.root       = root
+        self.pack_bytes = pack_bytes
+        self.lock       = threading.Lock()
+        self.pack       = None
+        self.maps       = {}
+        self.db = sqlite3.connect(
+            os.path.join(root, 'index.sqlite3'), isolation_level=None,
+            timeout=30, check_same_thread=False
+        )
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash   TEXT PRIMARY KEY,
+                pack   TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS candidates (
+                row         INTEGER NOT NULL,
+                activity_id TEXT,
+                type        TEXT,
+                seq         INTEGER NOT NULL,
+                url         TEXT NOT NULL,
+                ext         TEXT,
+                stage       TEXT,
+                hash        TEXT,
+                width       INTEGER,
+                height      INTEGER,
+                outcome     TEXT,
+                fetched     REAL,
+                PRIMARY KEY (row, url)
+            )
+        """)
+
+    def _writer(self, length):
+        # current pack, rolled over once it would pass pack_bytes
+        if self.pack is not None and self.pack.tell() + length > self.pack_bytes:
+            self.pack.close()
+            self.pack = None
+        if self.pack is None:
+            n = 0
+            while True:
+                name = f'pack_{os.getpid()}_{n}.bin'
+                path = os.path.join(self.root, name)
+                if not os.path.exists(path) or os.path.getsize(path) + length <= self.pack_bytes:
+                    break
+                n += 1
+            self.pack = open(path, 'ab')
+            self.pack_name = name
+        return self.pack
+
+    def store(self, h, path):
+        """Appends the file at `path` under `h` unless that body is already packed."""
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM blobs WHERE hash=?", (h,)).fetchone():
+                return
+            with open(path, 'rb') as src:
+                data = src.read()
+            f = self._writer(len(data))
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            self.db.execute(
+                "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                (h, self.pack_name, offset, len(data))
+            )
+
+    def record(self, row, activity_id, type_, seq, url, ext, stage, h, size, outcome):
+        """Records a candidate; a later record without a hash (or size) keeps the archived one."""
+        w, ht = size if size else (None, None)
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (row, url) DO UPDATE SET "
+                "activity_id=excluded.activity_id, type=excluded.type, seq=excluded.seq, "
+                "ext=excluded.ext, stage=excluded.stage, "
+                "hash=COALESCE(excluded.hash, hash), width=COALESCE(excluded.width, width), "
+                "height=COALESCE(excluded.height, height), "
+                "outcome=excluded.outcome, fetched=excluded.fetched",
+                (row, str(activity_id), str(type_), seq, url, ext, stage, h, w, ht,
+                 outcome, time.time())
+            )
+
+    def rows(self, start=0, stop=None):
+        cur = self.db.execute(
+            "SELECT DISTINCT row FROM candidates WHERE row>=? AND row<? ORDER BY row",
+            (start, stop if stop is not None else 2 ** 62)
+        )
+        return [r[0] for r in cur]
+
+    def candidates(self, row):
+        """The row's candidates in discovery order, as dicts."""
+        cur = self.db.execute(
+            "SELECT activity_id, type, url, ext, stage, hash, width, height, outcome "
+            "FROM candidates WHERE row=? ORDER BY seq", (row,)
+        )
+        keys = ('activity_id', 'type', 'url', 'ext', 'stage', 'hash', 'width', 'height', 'outcome')
+        return [dict(zip(keys, r)) for r in cur]
+
+    def read(self, h):
+        """Memory view of the stored body for `h`, or None."""
+        r = self.db.execute("SELECT pack, offset, length FROM blobs WHERE hash=?", (h,)).fetchone()
+        if not r:
+            return None
+        pack, offset, length = r
+        m = self.maps.get(pack)
+        if m is None or len(m) < offset + length:
+            # (re)map: the pack may have grown since it was first mapped
+            with open(os.path.join(self.root, pack), 'rb') as f:
+                m = self.maps[pack] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(m)[offset:offset + length]
+
+    def close(self):
+        with self.lock:
+            if self.pack is not None:
+                self.pack.close()
+                self.pack = None
+        self.maps.clear()
+        self.db.close()
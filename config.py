@@ -1,15 +1,72 @@
 # config.py
 
 input_excel = 'G:\\My Drive\\HireThen\\Internal - Flyberg Content\\Location Scrapping Info\\Shreya Dey for photos\\FINAL Charlotte.xlsx'
-last_processed_row = 1155
+start_row = 1155
 max_images_per_site = 10
 min_image_size = [250, 250]
 output_dir = 'G:\\My Drive\\HireThen\\Internal - Flyberg Content\\POI BreakOut Pictures\\Charlotte'
 log_excel = 'H:\\My Drive\\Python - Subhojyoti\\Image Scraper (No Filter) 2.0\\Logs\\Charlotte_Log.xlsx'
 summary_json = 'Logs\\Summaries\\summary_Charlotte.json'
+log_stream = 'H:\\My Drive\\Python - Subhojyoti\\Image Scraper (No Filter) 2.0\\Logs\\Charlotte_Log.jsonl'
+summary_stream = 'Logs\\Summaries\\summary_Charlotte.jsonl'
+log_flush_every = 50
+checkpoint_rows = 20
+checkpoint_seconds = 5.0
+state_db = 'Logs\\State\\state_Charlotte.sqlite3'
+image_index_db = 'Logs\\State\\image_index.sqlite3'
 download_concurrency = 4
 request_retries = 1
 timeout = 10
 log_level = 'ERROR'
 executor_workers = 4
 instances = 6
+max_image_bytes = 20 * 1024 * 1024
+phash_threshold = 6
+phash_cross_row = False
+http_cache_dir = 'Cache\\http'
+http_cache_max_bytes = 512 * 1024 * 1024
+css_fetch_concurrency = 4
+css_import_depth = 2
+parse_process_workers = 2
+parse_process_threshold = 1024 * 1024
+http_pool_limit = 100
+http_per_host_limit = 8
+dns_cache_ttl = 300
+host_rate = 5.0
+host_burst = 10
+host_stats_json = 'Logs\\Summaries\\hosts_Charlotte.json'
+retry_attempts = 3
+retry_backoff_base = 0.5
+retry_backoff_max = 10.0
+retry_after_max = 30.0
+breaker_threshold = 5
+breaker_cooldown = 60.0
+postprocess_workers = 0
+postprocess_max_dim = 2048
+postprocess_format = 'JPEG'
+postprocess_quality = 85
+row_concurrency = 4
+global_download_concurrency = 16
+selenium_pool_size = 2
+selenium_max_pages = 50
+queue_db = 'Logs\\State\\queue_Charlotte.sqlite3'
+shard_size = 25
+lease_seconds = 300
+metrics_stream = 'Logs\\Metrics\\metrics_Charlotte.jsonl'
+metrics_prom = 'Logs\\Metrics\\metrics_Charlotte.prom'
+profile_slow_rows = None
+profile_dir = 'Logs\\Profiles'
+archive_dir = None
+archive_min_size = [100, 100]
+archive_pack_bytes = 256 * 1024 * 1024
+speculative_dynamic = True
+strategy_db = 'Logs\\State\\strategy.sqlite3'
+strategy_min_rows = 3
+crawl_max_pages = 0
+crawl_depth = 1
+crawl_concurrency = 4
+crawl_sitemap = True
+staging_dir = None
+mover_queue = 256
+mover_workers = 2
+mover_retries = 5
@@ -3,9 +3,26 @@
 import importlib
 
 VARIABLES = [
-    'input_excel', 'last_processed_row', 'max_images_per_site', 'min_image_size',
+    'input_excel', 'start_row', 'max_images_per_site', 'min_image_size',
     'output_dir', 'log_excel', 'summary_json', 'download_concurrency',
-    'request_retries', 'timeout', 'log_level', 'executor_workers', 'instances'
+    'request_retries', 'timeout', 'log_level', 'executor_workers', 'instances',
+    'row_concurrency', 'global_download_concurrency',
+    'log_stream', 'summary_stream', 'log_flush_every', 'checkpoint_rows',
+    'checkpoint_seconds', 'state_db',
+    'selenium_pool_size', 'selenium_max_pages', 'max_image_bytes',
+    'image_index_db', 'phash_threshold', 'phash_cross_row',
+    'http_cache_dir', 'http_cache_max_bytes', 'css_fetch_concurrency',
+    'css_import_depth', 'parse_process_workers', 'parse_process_threshold',
+    'http_pool_limit', 'http_per_host_limit', 'dns_cache_ttl', 'host_rate',
+    'host_burst', 'host_stats_json', 'retry_attempts', 'retry_backoff_base',
+    'retry_backoff_max', 'retry_after_max', 'breaker_threshold', 'breaker_cooldown',
+    'postprocess_workers', 'postprocess_max_dim', 'postprocess_format',
+    'postprocess_quality', 'queue_db', 'shard_size', 'lease_seconds',
+    'metrics_stream', 'metrics_prom', 'profile_slow_rows', 'profile_dir',
+    'archive_dir', 'archive_min_size', 'archive_pack_bytes',
+    'speculative_dynamic', 'strategy_db', 'strategy_min_rows',
+    'crawl_max_pages', 'crawl_depth', 'crawl_concurrency', 'crawl_sitemap',
+    'staging_dir', 'mover_queue', 'mover_workers', 'mover_retries'
 ]
 
 def load_config():
@@ -15,30 +32,3 @@ def load_config():
     import config as _cfg
     importlib.reload(_cfg)
     return {v: getattr(_cfg, v) for v in VARIABLES}
-
-def update_last_row(row: int):
-    """
-    Updates last_processed_row in the *actual* config.py file on disk.
-    """
-    # Reload to pick up latest values
-    cfg = load_config()
-
-    # Set the new last_processed_row
-    cfg['last_processed_row'] = row
-
-    # Figure out exactly where config.py lives
-    import config as _cfg_mod
-    path = _cfg_mod.__file__
-    # If it's a .pyc, strip that off
-    if path.endswith('.pyc'):
-        path = path[:-1]
-
-    # Build the file contents
-    lines = ['# config.py', '']
-    for k in VARIABLES:
-        lines.append(f"{k} = {repr(cfg[k])}")
-    lines.append('')
-
-    # Overwrite the real config.py
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines))
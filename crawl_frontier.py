@@ -0,0 +1,191 @@
+# image_scraper/crawl_frontier.py
+
+import re
+import asyncio
+from urllib.parse import urljoin, urlsplit
+from bs4 import BeautifulSoup
+from fetcher import fetch
+from parser import extract_image_urls, ALLOWED
+from strategy_cache import domain_of
+from metrics import span, count
+
+try:
+    from lxml import etree
+except ImportError:  # fall back to BeautifulSoup
+    etree = None
+
+# link paths / anchor text of pages likely to hold many images
+GALLERY = re.compile(
+    r'galler|photo|portfolio|picture|images?\b|album|media|lookbook|showcase'
+    r'|projects?|our-work|about|team',
+    re.I
+)
+# links that are never HTML pages
+SKIP_EXT = ALLOWED + (
+    '.svg', '.pdf', '.zip', '.mp3', '.mp4', '.mov', '.css', '.js', '.xml',
+    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'
+)
+SITEMAP_LOC = re.compile(r'<loc>\s*(.*?)\s*</loc>', re.I | re.S)
+# child sitemaps read from a sitemap index
+SITEMAP_CHILDREN = 3
+
+class _Links:
+    """lxml parser target collecting (href, anchor text) pairs."""
+    def __init__(self):
+        self.links = []
+        self.href  = None
+        self.text  = []
+
+    def _flush(self):
+        if self.href is not None:
+            self.links.append((self.href, ' '.join(''.join(self.text).split())))
+            self.href = None
+
+    def start(self, tag, attrib):
+        if tag == 'a' and attrib.get('href'):
+            self._flush()
+            self.href = attrib['href']
+            self.text = [attrib.get('title') or '', ' ']
+
+    def end(self, tag):
+        if tag == 'a':
+            self._flush()
+
+    def data(self, data):
+        if self.href is not None:
+            self.text.append(data)
+
+    def close(self):
+        self._flush()
+        return self.links
+
+def extract_links(html, base):
+    """Absolute http(s) links of the page, with their anchor text."""
+    if etree is not None:
+        parser = etree.HTMLParser(target=_Links(), recover=True, no_network=True)
+        parser.feed(html)
+        pairs = parser.close()
+    else:
+        soup  = BeautifulSoup(html, 'html.parser')
+        pairs = [(a['href'], ' '.join(((a.get('title') or '') + ' ' + a.get_text(' ')).split()))
+                 for a in soup.find_all('a', href=True)]
+    out = []
+    for href, text in pairs:
+        u = urljoin(base, href.strip())
+        if u.lower().startswith(('http://', 'https://')):
+            out.append((u, text))
+    return out
+
+def _key(url):
+    """Visited-set key: no fragment, no trailing slash, case-folded host."""
+    p = urlsplit(url)
+    return f"{p.netloc.lower()}{p.path.rstrip('/') or '/'}?{p.query}"
+
+def _score(url, text=''):
+    path = urlsplit(url).path
+    return 2 * len(GALLERY.findall(path)) + len(GALLERY.findall(text))
+
+class CrawlFrontier:
+    """
+    Same-site crawl from a landing page, level by level: gallery-like links
+    (scored on path and anchor text) and matching sitemap entries, best
+    first, `crawl_concurrency` pages at a time, until `crawl_max_pages`
+    pages were fetched or `crawl_depth` levels were walked. Every page's images are
+    handed to `on_images` as soon as it is parsed, so downloads start while
+    the crawl goes on. The visited set holds one short key per URL and is
+    bounded by what the budget lets the crawl see.
+    """
+    def __init__(self, session, start_url, cfg, on_images):
+        self.session   = session
+        self.start     = start_url
+        self.domain    = domain_of(start_url)
+        self.cfg       = cfg
+        self.on_images = on_images
+        self.budget    = cfg['crawl_max_pages']
+        self.visited   = {_key(start_url)}
+        self.pages     = 0
+
+    def _candidate(self, url):
+        p = urlsplit(url)
+        if domain_of(url) != self.domain:
+            return False
+        if p.path.lower().endswith(SKIP_EXT):
+            return False
+        return _key(url) not in self.visited
+
+    def _pick(self, scored):
+        """Best-scoring unvisited candidates that fit the remaining budget."""
+        best = {}
+        for score, order, u in scored:
+            if score > 0 and self._candidate(u):
+                k = _key(u)
+                if k not in best or best[k][0] < score:
+                    best[k] = (score, order, u)
+        ranked = sorted(best.values(), key=lambda c: (-c[0], c[1]))
+        picked = [u for _, _, u in ranked[:max(0, self.budget - self.pages)]]
+        self.visited.update(_key(u) for u in picked)
+        return picked
+
+    async def _fetch(self, url):
+        with span('crawl_fetch') as s:
+            text, _ = await fetch(self.session, url, self.cfg['request_retries'], self.cfg['timeout'])
+            s.bytes = len(text) if text else 0
+        return text
+
+    async def _sitemap(self):
+        """Gallery-like page URLs from /sitemap.xml (one level of sitemap index)."""
+        p = urlsplit(self.start)
+        text = await self._fetch(f'{p.scheme}://{p.netloc}/sitemap.xml')
+        if not text:
+            return []
+        locs = SITEMAP_LOC.findall(text)
+        if '<sitemapindex' in text[:2048].lower():
+            children = sorted(locs, key=lambda u: -_score(u))[:SITEMAP_CHILDREN]
+            texts = await asyncio.gather(*(self._fetch(u) for u in children))
+            locs = [u for t in texts if t for u in SITEMAP_LOC.findall(t)]
+        return [u.replace('&amp;', '&') for u in locs]
+
+    async def _page(self, url, sem, depth):
+        """Fetches and parses one page; returns its links for the next level."""
+        async with sem:
+            if self.pages >= self.budget:
+                return []
+            self.pages += 1
+            html = await self._fetch(url)
+        if not html:
+            return []
+        count('crawl_pages')
+        with span('parse'):
+            images, _ = await extract_image_urls(
+                html, url, self.session, self.cfg['request_retries'],
+                self.cfg['timeout'], self.cfg['min_image_size']
+            )
+        self.on_images(images)
+        if depth >= self.cfg['crawl_depth']:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, extract_links, html, url)
+
+    async def run(self, html):
+        """Crawls outward from the landing page whose markup is `html`."""
+        if self.budget <= 0 or self.cfg['crawl_depth'] <= 0:
+            return
+        loop  = asyncio.get_running_loop()
+        links = loop.run_in_executor(None, extract_links, html, self.start)
+        if self.cfg['crawl_sitemap']:
+            links, sitemap = await asyncio.gather(links, self._sitemap())
+        else:
+            links, sitemap = await links, []
+        scored = [(_score(u, t), i, u) for i, (u, t) in enumerate(links)]
+        scored += [(_score(u), len(scored) + i, u) for i, u in enumerate(sitemap)]
+
+        sem = asyncio.Semaphore(max(1, self.cfg['crawl_concurrency']))
+        depth = 1
+        while self.pages < self.budget:
+            level = self._pick(scored)
+            if not level:
+                break
+            found = await asyncio.gather(*(self._page(u, sem, depth) for u in level))
+            depth += 1
+            scored = [(_score(u, t), i, u)
+                      for i, (u, t) in enumerate(p for sub in found for p in sub)]
@@ -0,0 +1,83 @@
+# image_scraper/css_fetcher.py
+
+import re
+import os
+import asyncio
+from urllib.parse import urljoin
+from fetcher import fetch
+from parser import CSS_URL
+
+CSS_IMPORT = re.compile(
+    r'@import\s+(?:url\(\s*)?["\']?([^"\')\s;]+)["\']?\s*\)?', re.IGNORECASE
+)
+ALLOWED = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.avif', '.heic')
+
+# run-wide memo: stylesheet URL -> (image URLs, @import URLs)
+_sheets = {}
+# stylesheet URL -> in-flight fetch task, so concurrent rows share one request
+_inflight = {}
+
+def parse_css(css_txt, css_url):
+    images = []
+    for m in CSS_URL.findall(css_txt):
+        u = urljoin(css_url, m)
+        if not u.lower().startswith(('http://', 'https://')):
+            continue
+        ext = os.path.splitext(u.lower().split('?', 1)[0])[1]
+        if ext in ALLOWED:
+            images.append(u)
+    imports = []
+    for m in CSS_IMPORT.findall(css_txt):
+        u = urljoin(css_url, m)
+        if u.lower().startswith(('http://', 'https://')):
+            imports.append(u)
+    return images, imports
+
+async def _load_sheet(session, css_url, retries, timeout):
+    css_txt, _ = await fetch(session, css_url, retries, timeout)
+    if not css_txt:
+        # not memoized, so a later row can try again
+        return [], []
+    parsed = parse_css(css_txt, css_url)
+    _sheets[css_url] = parsed
+    return parsed
+
+async def get_sheet(session, css_url, retries, timeout):
+    """(images, imports) for one stylesheet, fetched and parsed once per run."""
+    if css_url in _sheets:
+        return _sheets[css_url]
+    task = _inflight.get(css_url)
+    if task is None:
+        task = asyncio.ensure_future(_load_sheet(session, css_url, retries, timeout))
+        _inflight[css_url] = task
+        task.add_done_callback(lambda _: _inflight.pop(css_url, None))
+    # shielded: one row giving up must not cancel a fetch other rows await
+    return await asyncio.shield(task)
+
+async def prefetch_css(session, css_links, retries, timeout, concurrency, max_depth):
+    """
+    Fetches every stylesheet in `css_links` concurrently (at most
+    `concurrency` at a time), following @import up to `max_depth` levels.
+    Returns the image URLs in document order, deduplicated.
+    """
+    sem     = asyncio.Semaphore(max(1, concurrency))
+    visited = set()
+
+    async def walk(css_url, depth):
+        if css_url in visited:
+            return []
+        visited.add(css_url)
+        async with sem:
+            try:
+                images, imports = await get_sheet(session, css_url, retries, timeout)
+            except Exception:
+                return []
+        if depth >= max_depth or not imports:
+            return images
+        # imported sheets come first, as in the cascade
+        nested = await asyncio.gather(*(walk(u, depth + 1) for u in imports))
+        return [u for sub in nested for u in sub] + images
+
+    results = await asyncio.gather(*(walk(u, 0) for u in css_links))
+    seen = set()
+    return [u for sub in results for u in sub if u not in seen and not seen.add(u)]
@@ -1,29 +1,174 @@
 # image_scraper/downloader.py
 
 import io
-from PIL import Image
 import os
+import hashlib
+from urllib.parse import urlsplit
+from PIL import Image
+from metrics import span
+
+CHUNK_SIZE  = 64 * 1024
+# bytes to buffer while looking for the dimensions in the image header
+PROBE_BYTES = 64 * 1024
+# buffered bytes per disk write once the image has been accepted
+WRITE_BATCH = 256 * 1024
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.avif', '.heic')
+MAGIC = (
+    (b'\xff\xd8\xff', 'jpeg'), (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'), (b'GIF89a', 'gif'), (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'), (b'MM\x00*', 'tiff'),
+)
+ISO_BRANDS = (b'avif', b'avis', b'heic', b'heix', b'hevc', b'mif1', b'msf1')
+NOT_IMAGE_TYPES = ('text/', 'application/json', 'application/javascript',
+                   'application/xml', 'application/xhtml')
+# extensionless URLs a host must serve as images before we stop sniffing it
+SNIFF_TRUST = 3
+
+# host -> consecutive extensionless URLs that sniffed as images
+_host_trust = {}
+
+def sniff(head):
+    """Image format from magic bytes, or None."""
+    for sig, fmt in MAGIC:
+        if head.startswith(sig):
+            return fmt
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in ISO_BRANDS:
+        return head[8:12].decode()
+    return None
 
-def blocking_save(content, path, min_size):
+def needs_sniff(url):
+    """Extensionless URLs are sniffed, unless their host has proven it serves images."""
+    path = urlsplit(url).path.lower()
+    if path.endswith(IMAGE_EXTS):
+        return False
+    return _host_trust.get(urlsplit(url).hostname, 0) < SNIFF_TRUST
+
+def _sniffed(url, is_image):
+    host = urlsplit(url).hostname
+    _host_trust[host] = _host_trust.get(host, 0) + 1 if is_image else 0
+
+def probe_size(head):
+    """(width, height) from the leading bytes of an image, or None."""
     try:
-        img = Image.open(io.BytesIO(content))
-    except Exception as e:
-        return False, f'pil_error:{e}'
-    if img.width < min_size[0] or img.height < min_size[1]:
-        return False, 'too_small'
+        with Image.open(io.BytesIO(head)) as img:
+            return img.size
+    except Exception:
+        return None
+
+def big_enough(size, min_size):
+    return size[0] >= min_size[0] and size[1] >= min_size[1]
+
+def _open_for_write(path):
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    try:
-        with open(path, 'wb') as f:
-            f.write(content)
-    except Exception as e:
-        return False, f'fs_error:{e}'
-    return True, ''
+    return open(path, 'wb')
 
-async def download_image(session, url, path, min_size, timeout, loop):
+def _verify_file(path):
     try:
-        async with session.get(url, timeout=timeout) as resp:
-            resp.raise_for_status()
-            content = await resp.read()
-            return await loop.run_in_executor(None, blocking_save, content, path, min_size)
+        with Image.open(path) as img:
+            return img.size, ''
     except Exception as e:
-        return False, str(e)
+        return None, f'pil_error:{e}'
+
+def _discard(f, path):
+    f.close()
+    try: os.remove(path)
+    except OSError: pass
+
+async def download_image(session, url, path, min_size, timeout, loop, max_bytes=None,
+                         check_type=False):
+    """
+    Streams `url` to `path`. The dimensions are read from the first chunks,
+    so too-small images are dropped before anything touches the disk, and
+    the MD5 is computed while writing. With `check_type`, the Content-Type
+    and the magic bytes of the first chunk must say "image", otherwise the
+    transfer stops there (this replaces a separate HEAD probe).
+    Returns (ok, error, md5_hex, (width, height)) for content outcomes;
+    network and HTTP errors are raised so the caller can classify them.
+    """
+    f = None
+    with span('download') as sp:
+        try:
+            async with session.get(url, timeout=timeout) as resp:
+                resp.raise_for_status()
+                if max_bytes and (resp.content_length or 0) > max_bytes:
+                    return False, 'too_large', None, None
+                if check_type:
+                    ct = resp.headers.get('Content-Type', '').lower()
+                    if ct.startswith(NOT_IMAGE_TYPES):
+                        _sniffed(url, False)
+                        return False, f'not_image:{ct.split(";")[0]}', None, None
+
+                md5   = hashlib.md5()
+                buf   = bytearray()
+                size  = None
+                total = 0
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    total += len(chunk)
+                    sp.bytes = total
+                    if max_bytes and total > max_bytes:
+                        if f:
+                            await loop.run_in_executor(None, _discard, f, path)
+                            f = None
+                        return False, 'too_large', None, None
+                    md5.update(chunk)
+                    buf += chunk
+
+                    if check_type and len(buf) >= 12:
+                        fmt = sniff(bytes(buf[:12]))
+                        _sniffed(url, fmt is not None)
+                        if fmt is None:
+                            return False, 'not_image:magic', None, None
+                        check_type = False
+
+                    if f is None:
+                        # still probing the header
+                        size = probe_size(bytes(buf))
+                        if size and not big_enough(size, min_size):
+                            return False, 'too_small', None, size
+                        if size is None and len(buf) < PROBE_BYTES:
+                            continue
+                        f = await loop.run_in_executor(None, _open_for_write, path)
+
+                    if len(buf) >= WRITE_BATCH:
+                        with span('disk_write') as w:
+                            w.bytes = len(buf)
+                            await loop.run_in_executor(None, f.write, bytes(buf))
+                        buf.clear()
+
+                if check_type:
+                    # body shorter than any image signature
+                    _sniffed(url, False)
+                    return False, 'not_image:magic', None, None
+
+                if f is None:
+                    # whole body fit inside the probe window
+                    size = probe_size(bytes(buf))
+                    if size is None:
+                        return False, 'pil_error:cannot identify image file', None, None
+                    if not big_enough(size, min_size):
+                        return False, 'too_small', None, size
+                    f = await loop.run_in_executor(None, _open_for_write, path)
+                with span('disk_write') as w:
+                    w.bytes = len(buf)
+                    if buf:
+                        await loop.run_in_executor(None, f.write, bytes(buf))
+                    await loop.run_in_executor(None, f.close)
+                f = None
+
+                if size is None:
+                    # header was larger than the probe window; check the full file
+                    with span('decode'):
+                        size, err = await loop.run_in_executor(None, _verify_file, path)
+                    if size is None:
+                        return False, err, None, None
+                    if not big_enough(size, min_size):
+                        return False, 'too_small', None, size
+                return True, '', md5.hexdigest(), size
+        except BaseException:
+            # network / HTTP errors propagate to the retry policy
+            if f:
+                _discard(f, path)
+            raise
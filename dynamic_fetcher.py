@@ -1,134 +1,288 @@
 # image_scraper/dynamic_fetcher.py
 import threading
-import time
-import re
+import queue
 import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from urllib.parse import urljoin
+from metrics import span
 
-# ←←← add this at the top
-_selenium_lock = threading.Lock()
+def _new_driver():
+    opts = Options()
+    opts.headless = True
+    opts.add_argument('--ignore-certificate-errors')
+    opts.add_argument('--allow-insecure-localhost')
+    opts.add_argument('--disable-gpu')
+    opts.add_argument('--disable-software-rasterizer')
+    opts.add_argument('--no-sandbox')
+    opts.add_experimental_option('excludeSwitches', ['enable-logging'])
+    try:
+        return webdriver.Chrome(options=opts)
+    except Exception as e:
+        logging.warning(f"[Selenium] could not start Chrome: {e}")
+        raise
 
-def fetch_all_images_with_selenium(page_url: str, needed: int = None) -> list[str]:
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+class DriverPool:
+    """
+    Up to `size` Chrome instances, started lazily and reused across rows.
+    A driver is recycled after `max_pages` pages or as soon as a page
+    raises (crashed browser, dead session). Selenium calls run on the
+    pool's own executor so they never starve the default one.
+    """
+    def __init__(self, size=1, max_pages=50):
+        self.size      = max(1, size)
+        self.max_pages = max_pages
+        self.idle      = queue.LifoQueue()
+        self.slots     = threading.BoundedSemaphore(self.size)
+        self.closed    = False
+        self.executor  = ThreadPoolExecutor(
+            max_workers=self.size, thread_name_prefix='selenium'
+        )
+
+    @contextmanager
+    def checkout(self):
+        with self.slots:
+            try:
+                driver, pages = self.idle.get_nowait()
+            except queue.Empty:
+                with span('selenium_startup'):
+                    driver, pages = _new_driver(), 0
+            healthy = False
+            try:
+                yield driver
+                healthy = True
+            finally:
+                pages += 1
+                # a page still running when the pool closed quits its
+                # driver instead of parking it where nobody drains it
+                if healthy and pages < self.max_pages and not self.closed:
+                    self.idle.put((driver, pages))
+                else:
+                    _quit(driver)
+
+    def close(self):
+        """Waits for running pages, then quits every idle driver."""
+        self.closed = True
+        self.executor.shutdown(wait=True)
+        while True:
+            try:
+                driver, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            _quit(driver)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def configure_pool(size, max_pages):
+    """Replaces the process-wide pool (call once at startup)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = DriverPool(size, max_pages)
+    return _pool
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def fetch_all_images_with_selenium(page_url: str, needed: int = None,
+                                   min_size: list = None) -> list[str]:
     """
     Advanced Selenium fallback:
       - up to `needed` URLs
+      - one (best) variant per element, none below `min_size`
       - scroll & click load-more
       - scrape <img> tags + srcset
       - click thumbnails & any [onclick]
       - scan CSS background-images
     """
-    # acquire lock so we never spawn two browsers at once
-    with _selenium_lock:
-        opts = Options()
-        opts.headless = True
-        opts.add_argument('--ignore-certificate-errors')
-        opts.add_argument('--allow-insecure-localhost')
-        opts.add_argument('--disable-gpu')
-        opts.add_argument('--disable-software-rasterizer')
-        opts.add_argument('--no-sandbox')
-        opts.add_experimental_option('excludeSwitches', ['enable-logging'])
+    try:
+        with get_pool().checkout() as driver:
+            with span('selenium_harvest'):
+                return _harvest(driver, page_url, needed, min_size)
+    except Exception as e:
+        logging.warning(f"[Selenium] fetch failed for {page_url}: {e}")
+        return []
 
-        try:
-            driver = webdriver.Chrome(options=opts)
-        except Exception as e:
-            logging.warning(f"[Selenium] could not start Chrome: {e}")
-            return []
+# resolves once the DOM has been quiet for `quiet` ms (or after `limit` ms),
+# returning the current <img> count; replaces fixed sleeps
+_SETTLE_JS = """
+const done = arguments[arguments.length - 1];
+const quiet = arguments[0], limit = arguments[1];
+let timer, cap, obs;
+const finish = () => {
+    obs.disconnect(); clearTimeout(timer); clearTimeout(cap);
+    done(document.images.length);
+};
+obs = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(finish, quiet); });
+obs.observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true,
+    attributeFilter: ['src', 'srcset', 'style', 'class']
+});
+timer = setTimeout(finish, quiet);
+cap = setTimeout(finish, limit);
+"""
 
-        try:
-            driver.get(page_url)
-            time.sleep(1)
-
-            # 1) Scroll & click “load more”
-            for _ in range(5):
-                prev = len(driver.find_elements(By.TAG_NAME, 'img'))
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(1)
-                for sel in ('button.load-more', 'a.more', 'div.load-more'):
-                    for el in driver.find_elements(By.CSS_SELECTOR, sel):
-                        try:
-                            el.click()
-                            time.sleep(0.5)
-                        except:
-                            pass
-                if needed and len(driver.find_elements(By.TAG_NAME, 'img')) >= needed:
-                    break
-                if len(driver.find_elements(By.TAG_NAME, 'img')) == prev:
-                    break
-
-            seen = set()
-            urls = []
-            bg_re = re.compile(r'url\(["\']?(.*?)["\']?\)')
-
-            def add(u):
-                if not u or u.lower().endswith('.svg'):
-                    return False
-                full = urljoin(page_url, u)
-                if full in seen:
-                    return False
-                seen.add(full)
-                urls.append(full)
-                return True
+# collects every candidate in one round trip: the best <img>/<source>
+# variant per element (src, srcset, lazy data-* attributes) and computed
+# background-image URLs
+_HARVEST_JS = """
+const minW = arguments[0] || 0, minH = arguments[1] || 0;
+const out = [];
+const lazy = ['data-src', 'data-srcset', 'data-lazy', 'data-original',
+              'data-lazy-image', 'data-img', 'data-deferred', 'data-bg',
+              'data-background'];
+const push = u => { if (u) out.push(u.trim()); };
+// absolute URL, or null for a value new URL() rejects
+const resolve = u => { try { return new URL(u, location.href).href; } catch (e) { return null; } };
+const parseSet = (s, cands) => {
+    if (!s) return;
+    s.split(',').forEach(c => {
+        const bits = c.trim().split(/\\s+/);
+        if (!bits[0]) return;
+        let w = 0, x = 1;
+        bits.slice(1).forEach(d => {
+            d = d.toLowerCase();
+            if (d.endsWith('w')) w = parseFloat(d) || 0;
+            else if (d.endsWith('x')) x = parseFloat(d) || 1;
+        });
+        cands.push([bits[0], w, x]);
+    });
+};
+// one group per <img>, lone <source> or whole <picture>
+const groups = new Map();
+document.querySelectorAll('img, source').forEach(el => {
+    const key = el.closest('picture') || el;
+    if (!groups.has(key)) groups.set(key, []);
+    const cands = groups.get(key);
+    parseSet(el.getAttribute('srcset'), cands);
+    lazy.forEach(a => {
+        const v = el.getAttribute(a);
+        if (v) { a.endsWith('srcset') ? parseSet(v, cands) : cands.push([v, 0, 1]); }
+    });
+    const src = el.getAttribute('src');
+    if (src) cands.push([src, 0, 1]);
+    if (el.currentSrc) cands.push([el.currentSrc, 0, 1]);
+});
+// keep the best variant per group: largest w descriptor, else largest x;
+// drop groups whose declared or loaded size is already below the minimum
+groups.forEach((all, key) => {
+    // a malformed candidate is skipped instead of aborting the harvest
+    const cands = all.filter(c => resolve(c[0]) !== null);
+    if (!cands.length) return;
+    const byW = cands.some(c => c[1]);
+    let best = cands[0];
+    cands.forEach(c => { if (byW ? c[1] > best[1] : c[2] > best[2]) best = c; });
+    if (byW && best[1] < minW) return;
+    const img = key.tagName === 'IMG' ? key : key.querySelector('img');
+    if (img && img.complete && img.naturalWidth &&
+        resolve(best[0]) === img.currentSrc &&
+        (img.naturalWidth < minW || img.naturalHeight < minH)) return;
+    push(best[0]);
+});
+const re = /url\\(["']?(.*?)["']?\\)/g;
+document.querySelectorAll('*').forEach(el => {
+    const bg = getComputedStyle(el).backgroundImage;
+    if (bg && bg !== 'none') { for (const m of bg.matchAll(re)) push(m[1]); }
+});
+return out;
+"""
+
+SETTLE_QUIET_MS = 300
+SETTLE_LIMIT_MS = 3000
+
+def _settle(driver):
+    try:
+        return driver.execute_async_script(_SETTLE_JS, SETTLE_QUIET_MS, SETTLE_LIMIT_MS)
+    except Exception:
+        return len(driver.find_elements(By.TAG_NAME, 'img'))
 
-            # 2) scrape <img> tags + srcset
-            for img in driver.find_elements(By.TAG_NAME, 'img'):
-                if add(img.get_attribute('src') or '') and needed and len(urls) >= needed:
-                    return urls
-                srcset = img.get_attribute('srcset') or ''
-                for cand in (u.strip().split(' ')[0] for u in srcset.split(',')):
-                    if add(cand) and needed and len(urls) >= needed:
-                        return urls
-
-            # 3) click thumbnails & onclicks
-            thumbs     = driver.find_elements(By.CSS_SELECTOR, 'img.thumbnail, a.gallery-thumb')
-            clickables = driver.find_elements(By.CSS_SELECTOR, '[onclick]')
-            for el in thumbs + clickables:
-                if needed and len(urls) >= needed:
-                    break
+def _harvest(driver, page_url, needed, min_size):
+    driver.set_script_timeout(SETTLE_LIMIT_MS / 1000 + 5)
+    driver.get(page_url)
+    count = _settle(driver)
+
+    # 1) Scroll & click “load more”
+    for _ in range(5):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        for sel in ('button.load-more', 'a.more', 'div.load-more'):
+            for el in driver.find_elements(By.CSS_SELECTOR, sel):
                 try:
-                    driver.execute_script("arguments[0].scrollIntoView(true);", el)
                     el.click()
-                    time.sleep(1)
-                    for img in driver.find_elements(By.TAG_NAME, 'img'):
-                        if add(img.get_attribute('src') or '') and needed and len(urls) >= needed:
-                            break
-                        srcset = img.get_attribute('srcset') or ''
-                        for cand in (u.strip().split(' ')[0] for u in srcset.split(',')):
-                            if add(cand) and needed and len(urls) >= needed:
-                                break
                 except:
                     pass
-                finally:
-                    try:
-                        driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
-                        time.sleep(0.5)
-                    except:
-                        pass
-
-            # 4) scan CSS background-images
-            for el in driver.find_elements(By.CSS_SELECTOR, '*'):
-                if needed and len(urls) >= needed:
-                    break
-                try:
-                    bg = driver.execute_script(
-                        "return window.getComputedStyle(arguments[0])"
-                        ".getPropertyValue('background-image')",
-                        el
-                    ) or ''
-                except:
-                    continue
-                for m in bg_re.findall(bg):
-                    if add(m) and needed and len(urls) >= needed:
-                        break
+        now = _settle(driver)
+        if needed and now >= needed:
+            break
+        if now == count:
+            break
+        count = now
 
-            return urls
+    seen = set()
+    urls = []
 
-        except Exception as e:
-            logging.warning(f"[Selenium] fetch failed for {page_url}: {e}")
-            return []
+    def add(u):
+        if not u or u.lower().endswith('.svg'):
+            return False
+        full = urljoin(page_url, u)
+        if full in seen:
+            return False
+        seen.add(full)
+        urls.append(full)
+        return True
 
+    min_w, min_h = min_size or (0, 0)
+
+    def harvest():
+        for u in driver.execute_script(_HARVEST_JS, min_w, min_h) or []:
+            if add(u) and needed and len(urls) >= needed:
+                return True
+        return False
+
+    # 2) imgs, srcsets, lazy attributes and backgrounds in one call
+    if harvest():
+        return urls
+
+    # 3) click thumbnails & onclicks, re-harvesting after each
+    thumbs     = driver.find_elements(By.CSS_SELECTOR, 'img.thumbnail, a.gallery-thumb')
+    clickables = driver.find_elements(By.CSS_SELECTOR, '[onclick]')
+    for el in thumbs + clickables:
+        if needed and len(urls) >= needed:
+            break
+        try:
+            driver.execute_script("arguments[0].scrollIntoView(true);", el)
+            el.click()
+            _settle(driver)
+            harvest()
+        except:
+            pass
         finally:
-            driver.quit()
+            try:
+                driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
+                _settle(driver)
+            except:
+                pass
+
+    return urls
@@ -1,12 +1,50 @@
 # image_scraper/fetcher.py
 
+import asyncio
+from http_cache import HttpCache
+from retry import get_policy
+from metrics import count
+
+_cache = None
+
+def configure_cache(root, max_bytes):
+    """Enables the disk-backed response cache for every fetch() in the process."""
+    global _cache
+    shutdown_cache()
+    if root:
+        _cache = HttpCache(root, max_bytes)
+    return _cache
+
+def shutdown_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
 async def fetch(session, url, retries, timeout):
-    last_err = None
-    for _ in range(retries):
-        try:
-            resp = await session.get(url, timeout=timeout)
+    cache = _cache
+    # the cache's SQLite index and body files are blocking I/O
+    loop  = asyncio.get_running_loop()
+    entry = await loop.run_in_executor(None, cache.lookup, url) if cache else None
+    if entry and cache.is_fresh(entry):
+        await loop.run_in_executor(None, cache.touch, url)
+        count('http_cache_hit')
+        return entry['body'], None
+    headers = cache.validators(entry) if entry else {}
+
+    async def _get():
+        async with session.get(url, timeout=timeout, headers=headers) as resp:
+            if resp.status == 304 and entry:
+                await loop.run_in_executor(None, cache.revalidated, url, resp.headers)
+                count('http_cache_revalidated')
+                return entry['body']
             resp.raise_for_status()
-            return await resp.text(), None
-        except Exception as e:
-            last_err = str(e)
-    return None, last_err
+            text = await resp.text()
+            if cache:
+                await loop.run_in_executor(None, cache.store, url, resp.headers, text)
+            return text
+
+    try:
+        return await get_policy().call(url, _get, attempts=retries), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
@@ -0,0 +1,159 @@
+# image_scraper/http_cache.py
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+
+_MAX_AGE = re.compile(r'(?:s-maxage|max-age)\s*=\s*(\d+)')
+
+def _freshness(headers, now):
+    """
+    (store, expires) from Cache-Control / Expires. `expires` of 0 means
+    "always revalidate" (no-cache, or no explicit lifetime).
+    """
+    cc = headers.get('Cache-Control', '').lower()
+    if 'no-store' in cc:
+        return False, 0
+    if 'no-cache' in cc:
+        return True, 0
+    m = _MAX_AGE.search(cc)
+    if m:
+        return True, now + int(m.group(1))
+    exp = headers.get('Expires')
+    if exp:
+        try:
+            return True, parsedate_to_datetime(exp).timestamp()
+        except (TypeError, ValueError):
+            return True, 0
+    return True, 0
+
+class HttpCache:
+    """
+    Disk-backed LRU cache for text responses (pages and stylesheets).
+    Bodies live as files under `root`; an SQLite table keeps the
+    validators (ETag / Last-Modified), expiry and last access time, and
+    least-recently-used entries are evicted once `max_bytes` is exceeded.
+    Thread-safe: fetch() calls it from the default executor.
+    """
+    def __init__(self, root, max_bytes):
+        self.root      = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite3'), isolation_level=None,
+                                  timeout=30, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url           TEXT PRIMARY KEY,
+                key           TEXT NOT NULL,
+                etag          TEXT,
+                last_modified TEXT,
+                expires       REAL,
+                size          INTEGER,
+                accessed      REAL
+            ) WITHOUT ROWID
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS by_access ON entries (accessed)")
+        self.total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def lookup(self, url):
+        """Cache entry dict for `url` (body included), or None."""
+        with self.lock:
+            r = self.db.execute(
+                "SELECT key, etag, last_modified, expires FROM entries WHERE url=?", (url,)
+            ).fetchone()
+            if not r:
+                return None
+            try:
+                with open(self._path(r[0]), encoding='utf-8') as f:
+                    body = f.read()
+            except OSError:
+                self._drop(url)
+                return None
+            return {'etag': r[1], 'last_modified': r[2], 'expires': r[3] or 0, 'body': body}
+
+    def is_fresh(self, entry):
+        return entry['expires'] > time.time()
+
+    def validators(self, entry):
+        h = {}
+        if entry['etag']:
+            h['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            h['If-Modified-Since'] = entry['last_modified']
+        return h
+
+    def revalidated(self, url, headers):
+        """A 304 came back: refresh expiry (and validators if sent)."""
+        with self.lock:
+            now = time.time()
+            _, expires = _freshness(headers, now)
+            self.db.execute(
+                "UPDATE entries SET expires=?, accessed=?, "
+                "etag=COALESCE(?, etag), last_modified=COALESCE(?, last_modified) "
+                "WHERE url=?",
+                (expires, now, headers.get('ETag'), headers.get('Last-Modified'), url)
+            )
+
+    def touch(self, url):
+        with self.lock:
+            self.db.execute("UPDATE entries SET accessed=? WHERE url=?", (time.time(), url))
+
+    def store(self, url, headers, body):
+        with self.lock:
+            now = time.time()
+            keep, expires = _freshness(headers, now)
+            etag, lm = headers.get('ETag'), headers.get('Last-Modified')
+            if not keep or not (expires > now or etag or lm):
+                # nothing we could serve or revalidate later
+                return
+            data = body.encode('utf-8')
+            if len(data) > self.max_bytes:
+                return
+            key  = hashlib.sha1(url.encode('utf-8')).hexdigest()
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+            old = self.db.execute("SELECT size FROM entries WHERE url=?", (url,)).fetchone()
+            self.total += len(data) - (old[0] if old else 0)
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, key, etag, lm, expires, len(data), now)
+            )
+            if self.total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # drop least recently used entries down to 90% of the cap
+        target = self.max_bytes * 0.9
+        for url, size in self.db.execute(
+            "SELECT url, size FROM entries ORDER BY accessed"
+        ).fetchall():
+            if self.total <= target:
+                break
+            self._drop(url)
+
+    def _drop(self, url):
+        r = self.db.execute("SELECT key, size FROM entries WHERE url=?", (url,)).fetchone()
+        if not r:
+            return
+        self.db.execute("DELETE FROM entries WHERE url=?", (url,))
+        self.total -= r[1] or 0
+        try: os.remove(self._path(r[0]))
+        except OSError: pass
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,102 @@
+# image_scraper/image_index.py
+
+import os
+import time
+import sqlite3
+import threading
+
+# outcomes that will not change on a retry, so they are safe to remember;
+# too_small is stored with the dimensions and re-checked against the current
+# min_image_size on replay. too_large / not_image depend on max_image_bytes
+# and sniffing and are not remembered.
+PERMANENT = ('ok', 'too_small', 'pil_error')
+
+def outcome_of(ok, err):
+    if ok:
+        return 'ok'
+    for o in PERMANENT[1:]:
+        if err.startswith(o):
+            return o
+    return None
+
+class ImageIndex:
+    """
+    Persistent content-addressed index shared by every row and run:
+      blobs: md5 -> stored file (+ dimensions)
+      urls:  url -> last permanent outcome (md5 / dimensions / rejection)
+    Both are primary-key lookups, so they stay fast at millions of entries.
+    Stored files are ordinary output names, which a later run may rewrite
+    with other content: writers call forget_path() before replacing a file
+    and record_blob() once it holds the new content. The write-behind
+    mover records from its own threads, hence the lock.
+    """
+    def __init__(self, path):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, isolation_level=None, timeout=30,
+                                  check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash   TEXT PRIMARY KEY,
+                path   TEXT NOT NULL,
+                width  INTEGER,
+                height INTEGER
+            ) WITHOUT ROWID
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS blobs_path ON blobs (path)")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url     TEXT PRIMARY KEY,
+                outcome TEXT NOT NULL,
+                hash    TEXT,
+                width   INTEGER,
+                height  INTEGER,
+                checked REAL
+            ) WITHOUT ROWID
+        """)
+
+    def lookup_url(self, url):
+        with self.lock:
+            r = self.db.execute(
+                "SELECT outcome, hash, width, height FROM urls WHERE url=?", (url,)
+            ).fetchone()
+        if not r:
+            return None
+        return {'outcome': r[0], 'hash': r[1], 'size': (r[2], r[3]) if r[2] else None}
+
+    def lookup_hash(self, h):
+        """Stored path for `h`, or None if unknown or the file has gone."""
+        with self.lock:
+            r = self.db.execute("SELECT path FROM blobs WHERE hash=?", (h,)).fetchone()
+        if r and os.path.exists(r[0]):
+            return r[0]
+        return None
+
+    def record_url(self, url, outcome, h=None, size=None):
+        w, ht = size if size else (None, None)
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?)",
+                (url, outcome, h, w, ht, time.time())
+            )
+
+    def record_blob(self, h, path, size=None):
+        w, ht = size if size else (None, None)
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)",
+                (h, path, w, ht)
+            )
+
+    def forget_path(self, path, keep=None):
+        """Drops blobs stored at `path` (other than `keep`): the file is about to be rewritten."""
+        with self.lock:
+            self.db.execute("DELETE FROM blobs WHERE path=? AND hash IS NOT ?", (path, keep))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,110 @@
+# image_scraper/input_reader.py
+
+import os
+import csv
+import json
+from itertools import islice
+from openpyxl import load_workbook
+
+try:  # Parquet input is optional
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+COLUMNS = ('Type', 'ActivityId', 'Website')
+
+def _format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        return 'xlsx'
+    if ext in ('.csv', '.tsv'):
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.parquet':
+        return 'parquet'
+    raise ValueError(f'unsupported input format: {path}')
+
+def _positions(header):
+    missing = [c for c in COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f'input is missing columns: {", ".join(missing)}')
+    return [header.index(c) for c in COLUMNS]
+
+def _xlsx(path, start, stop):
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        header = next(ws.iter_rows(max_row=1, values_only=True), ())
+        cols = _positions(list(header))
+        # sheet row 1 is the header, so data row i is sheet row i + 2
+        rows = ws.iter_rows(
+            min_row=start + 2, max_row=None if stop is None else stop + 1,
+            values_only=True
+        )
+        for i, r in enumerate(rows, start):
+            if any(v is not None for v in r):  # formatted but empty rows
+                yield (i, *(r[c] if c < len(r) else None for c in cols))
+    finally:
+        wb.close()
+
+def _csv(path, start, stop):
+    delimiter = '\t' if path.lower().endswith('.tsv') else ','
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        cols = _positions(next(reader, []))
+        for i, r in enumerate(islice(reader, start, stop), start):
+            yield (i, *(r[c] or None if c < len(r) else None for c in cols))
+
+def _jsonl(path, start, stop):
+    with open(path, encoding='utf-8') as f:
+        # earlier lines are skipped unparsed
+        lines = (line for line in f if line.strip())
+        for i, line in enumerate(islice(lines, start, stop), start):
+            e = json.loads(line)
+            yield (i, *(e.get(c) for c in COLUMNS))
+
+def _parquet(path, start, stop):
+    if pq is None:
+        raise ImportError('Parquet input needs pyarrow')
+    pf = pq.ParquetFile(path)
+    first = 0
+    for g in range(pf.num_row_groups):
+        n = pf.metadata.row_group(g).num_rows
+        lo, hi = first, first + n
+        first = hi
+        # row groups wholly before the offset are never read
+        if hi <= start:
+            continue
+        if stop is not None and lo >= stop:
+            break
+        table = pf.read_row_group(g, columns=list(COLUMNS)).to_pydict()
+        for j in range(max(start, lo) - lo, (hi if stop is None else min(hi, stop)) - lo):
+            yield (lo + j, *(table[c][j] for c in COLUMNS))
+
+_READERS = {'xlsx': _xlsx, 'csv': _csv, 'jsonl': _jsonl, 'parquet': _parquet}
+
+def read_rows(path, start=0, stop=None):
+    """
+    Lazily yields (idx, type_, activity_id, website) for data rows
+    [start, stop), where idx is the 0-based row after the header. Nothing
+    before `start` is materialized, so memory stays flat with sheet size.
+    """
+    return _READERS[_format(path)](path, start, stop)
+
+def count_rows(path):
+    """Number of data rows, from metadata where the format has it."""
+    fmt = _format(path)
+    if fmt == 'parquet':
+        if pq is None:
+            raise ImportError('Parquet input needs pyarrow')
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == 'xlsx':
+        wb = load_workbook(path, read_only=True)
+        try:
+            ws = wb.active
+            if ws.max_row:
+                return max(0, ws.max_row - 1)
+        finally:
+            wb.close()
+    return sum(1 for _ in read_rows(path))
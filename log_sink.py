@@ -0,0 +1,137 @@
+# image_scraper/log_sink.py
+
+import os
+import json
+import threading
+from openpyxl import Workbook, load_workbook
+
+LOG_COLUMNS = ['row', 'activity_id', 'url', 'file', 'status', 'error', 'attempts']
+
+class LogSink:
+    """
+    Append-only JSONL sink. Entries are buffered and written in batches of
+    `flush_every`, so each append costs O(1) regardless of log size.
+    flush() may run on an executor thread while entries are appended.
+    """
+    def __init__(self, path, flush_every=50):
+        self.path        = path
+        self.flush_every = max(1, flush_every)
+        self.buffer      = []
+        self.lock        = threading.Lock()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.f = open(path, 'a', encoding='utf-8')
+
+    def append(self, entry):
+        line = json.dumps(entry, default=str)
+        with self.lock:
+            self.buffer.append(line)
+            full = len(self.buffer) >= self.flush_every
+        if full:
+            self.flush()
+
+    def extend(self, entries):
+        for e in entries:
+            self.append(e)
+
+    def flush(self, sync=False):
+        """Writes the buffer out; with `sync`, also to disk (fsync)."""
+        with self.lock:
+            buf, self.buffer = self.buffer, []
+            if buf:
+                self.f.write('\n'.join(buf) + '\n')
+            self.f.flush()
+        if sync:
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.f.close()
+
+def read_stream(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # a crash can leave a torn last line; skip it
+                continue
+
+def part_path(path, worker):
+    """Per-worker stream next to `path`, so workers never interleave writes."""
+    base, ext = os.path.splitext(path)
+    return f'{base}.{worker}{ext}'
+
+def merge_part(part, path):
+    """
+    Appends a closed per-worker stream to the main stream and removes it.
+    Callers hold the work queue's lock so merges never overlap.
+    """
+    if not os.path.exists(part):
+        return
+    with open(part, 'rb') as src, open(path, 'ab') as dst:
+        last = b'\n'
+        for chunk in iter(lambda: src.read(1 << 20), b''):
+            dst.write(chunk)
+            last = chunk[-1:]
+        if last != b'\n':
+            # a crashed worker's torn last line must not swallow the next one
+            dst.write(b'\n')
+    os.remove(part)
+
+def import_excel_log(xlsx_path, stream_path):
+    """
+    One-time migration: seed a fresh JSONL stream with the rows of an
+    existing Excel log so the next export doesn't drop them.
+    """
+    if os.path.exists(stream_path) or not os.path.exists(xlsx_path):
+        return
+    wb = load_workbook(xlsx_path, read_only=True)
+    sink = LogSink(stream_path, flush_every=1000)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        next(rows, None)  # header
+        for r in rows:
+            sink.append(dict(zip(LOG_COLUMNS, r)))
+    finally:
+        sink.close()
+        wb.close()
+
+def export_excel(stream_path, xlsx_path):
+    """Writes the whole log stream to Excel in one pass (write-only mode)."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(LOG_COLUMNS)
+    for e in read_stream(stream_path):
+        ws.append([e.get(c) for c in LOG_COLUMNS])
+    d = os.path.dirname(xlsx_path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    wb.save(xlsx_path)
+
+def export_summary(stream_path, json_path):
+    """Writes the summary stream as a JSON list, keeping the latest entry per row."""
+    latest = {}
+    for e in read_stream(stream_path):
+        latest[e['row']] = e
+    d = os.path.dirname(json_path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with open(json_path, 'w') as f:
+        json.dump(list(latest.values()), f, indent=2)
+
+def export_reports(cfg):
+    export_excel(cfg['log_stream'], cfg['log_excel'])
+    export_summary(cfg['summary_stream'], cfg['summary_json'])
+
+if __name__ == '__main__':
+    # on-demand export while a run is still going (or after a crash)
+    from config_manager import load_config
+    export_reports(load_config())
@@ -0,0 +1,211 @@
+# image_scraper/metrics.py
+
+import os
+import time
+import cProfile
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from log_sink import LogSink, part_path
+
+# upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# minimum seconds between rewrites of the Prometheus file
+PROM_EVERY = 10.0
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum    = 0.0
+        self.count  = 0
+
+    def observe(self, v):
+        self.counts[bisect_left(BUCKETS, v)] += 1
+        self.sum   += v
+        self.count += 1
+
+    def lines(self, name, labels):
+        out, acc = [], 0
+        for le, n in zip(BUCKETS + ('+Inf',), self.counts):
+            acc += n
+            out.append(f'{name}_bucket{{{labels},le="{le}"}} {acc}')
+        out.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        out.append(f'{name}_count{{{labels}}} {self.count}')
+        return out
+
+class _Span:
+    __slots__ = ('bytes',)
+
+    def __init__(self):
+        self.bytes = 0
+
+# per-row accumulator; tasks a row creates inherit it
+_row = contextvars.ContextVar('metrics_row', default=None)
+
+class Metrics:
+    """
+    Process-wide timings and counters: a latency histogram and byte total
+    per stage, event counters, and latency histograms / bytes per host.
+    Stages may nest (a download span includes its disk writes) and run in
+    worker threads, so updates take a lock. Each finished row is appended
+    to `stream_path` (JSONL) with its own per-stage totals, and the
+    aggregates are rewritten to `prom_path` in Prometheus text format.
+    """
+    def __init__(self, stream_path=None, prom_path=None, flush_every=50,
+                 profile_over=None, profile_dir=None):
+        self.lock        = threading.RLock()
+        self.stages      = {}
+        self.stage_bytes = {}
+        self.counters    = {}
+        self.hosts       = {}
+        self.host_bytes  = {}
+        self.prom_path    = prom_path
+        self.prom_written = 0.0
+        self.sink         = LogSink(stream_path, flush_every) if stream_path else None
+        self.profile_over = profile_over
+        self.profile_dir  = profile_dir
+        self.profiling    = False
+
+    def observe(self, stage, seconds, nbytes=0):
+        with self.lock:
+            h = self.stages.get(stage)
+            if h is None:
+                h = self.stages[stage] = Histogram()
+            h.observe(seconds)
+            if nbytes:
+                self.stage_bytes[stage] = self.stage_bytes.get(stage, 0) + nbytes
+        acc = _row.get()
+        if acc is not None:
+            s = acc.setdefault(stage, [0, 0.0, 0])
+            s[0] += 1
+            s[1] += seconds
+            s[2] += nbytes
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe_host(self, host, seconds):
+        with self.lock:
+            h = self.hosts.get(host)
+            if h is None:
+                h = self.hosts[host] = Histogram()
+            h.observe(seconds)
+
+    def add_host_bytes(self, host, n):
+        with self.lock:
+            self.host_bytes[host] = self.host_bytes.get(host, 0) + n
+
+    @contextmanager
+    def row(self, idx):
+        """
+        Collects the row's spans and writes its record on exit. With
+        `profile_over` set, one row at a time runs under cProfile and its
+        stats are kept if it took longer than that; rows overlap on the
+        event loop, so run with row_concurrency = 1 for a clean profile.
+        """
+        acc   = {}
+        token = _row.set(acc)
+        prof  = None
+        if self.profile_over is not None and not self.profiling:
+            self.profiling = True
+            prof = cProfile.Profile()
+            prof.enable()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            _row.reset(token)
+            if prof is not None:
+                prof.disable()
+                self.profiling = False
+                if elapsed >= self.profile_over:
+                    os.makedirs(self.profile_dir, exist_ok=True)
+                    prof.dump_stats(os.path.join(self.profile_dir, f'row_{idx}.prof'))
+            self.observe('row', elapsed)
+            if self.sink is not None:
+                self.sink.append({
+                    'row': idx, 'seconds': round(elapsed, 4),
+                    'stages': {k: {'n': n, 'seconds': round(s, 4), 'bytes': b}
+                               for k, (n, s, b) in acc.items()},
+                })
+            if time.monotonic() - self.prom_written >= PROM_EVERY:
+                self.write_prometheus()
+
+    def prometheus(self):
+        with self.lock:
+            out = ['# TYPE scraper_stage_seconds histogram']
+            for stage, h in sorted(self.stages.items()):
+                out += h.lines('scraper_stage_seconds', f'stage="{stage}"')
+            out.append('# TYPE scraper_stage_bytes_total counter')
+            for stage, n in sorted(self.stage_bytes.items()):
+                out.append(f'scraper_stage_bytes_total{{stage="{stage}"}} {n}')
+            out.append('# TYPE scraper_events_total counter')
+            for name, n in sorted(self.counters.items()):
+                out.append(f'scraper_events_total{{event="{name}"}} {n}')
+            out.append('# TYPE scraper_host_latency_seconds histogram')
+            for host, h in sorted(self.hosts.items()):
+                out += h.lines('scraper_host_latency_seconds', f'host="{host}"')
+            out.append('# TYPE scraper_host_bytes_total counter')
+            for host, n in sorted(self.host_bytes.items()):
+                out.append(f'scraper_host_bytes_total{{host="{host}"}} {n}')
+        return '\n'.join(out) + '\n'
+
+    def write_prometheus(self):
+        """Atomically rewrites the text file (for node_exporter's textfile collector)."""
+        self.prom_written = time.monotonic()
+        if not self.prom_path:
+            return
+        d = os.path.dirname(self.prom_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = self.prom_path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(tmp, self.prom_path)
+
+    def close(self):
+        self.write_prometheus()
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+_metrics = Metrics()
+
+def configure_metrics(cfg, worker=None):
+    """Replaces the process-wide collector; a `worker` gets its own files."""
+    global _metrics
+    shutdown_metrics()
+    stream, prom = cfg['metrics_stream'], cfg['metrics_prom']
+    if worker:
+        stream = stream and part_path(stream, worker)
+        prom   = prom and part_path(prom, worker)
+    _metrics = Metrics(
+        stream, prom,
+        cfg['log_flush_every'],
+        cfg['profile_slow_rows'], cfg['profile_dir'],
+    )
+    return _metrics
+
+def shutdown_metrics():
+    global _metrics
+    _metrics.close()
+    _metrics = Metrics()
+
+def get_metrics():
+    return _metrics
+
+@contextmanager
+def span(stage):
+    """Times the block as `stage`; set `.bytes` on the yielded span to count bytes."""
+    s  = _Span()
+    t0 = time.perf_counter()
+    try:
+        yield s
+    finally:
+        _metrics.observe(stage, time.perf_counter() - t0, s.bytes)
+
+def count(name, n=1):
+    _metrics.count(name, n)
@@ -0,0 +1,192 @@
+# image_scraper/network.py
+
+import os
+import json
+import time
+import asyncio
+import aiohttp
+from yarl import URL
+from metrics import get_metrics
+from retry import parse_retry_after
+
+class TokenBucket:
+    """
+    Per-host politeness: `rate` requests/sec with bursts of `burst`. The
+    rate is halved on a 429 (and paused for Retry-After) and creeps back
+    toward its configured value on successful responses.
+    """
+    def __init__(self, rate, burst):
+        self.base_rate     = rate
+        self.rate          = rate
+        self.burst         = burst
+        self.tokens        = burst
+        self.updated       = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock          = asyncio.Lock()
+
+    async def acquire(self):
+        # waiters queue on the lock, so a host is served in FIFO order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens  = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttled(self, retry_after=None):
+        self.rate = max(self.base_rate / 16, self.rate / 2)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def ok(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate * 1.05)
+
+class _Throttled:
+    """
+    `async with` for one request that waits for the host's token first, so
+    the wait never counts toward the request's own timeout.
+    """
+    def __init__(self, net, session, method, url, kwargs):
+        self.net     = net
+        self.session = session
+        self.method  = method
+        self.url     = url
+        self.kwargs  = kwargs
+        self.ctx     = None
+
+    async def __aenter__(self):
+        await self.net.throttle(URL(str(self.url)).host or '')
+        self.ctx = self.session.request(self.method, self.url, **self.kwargs)
+        return await self.ctx.__aenter__()
+
+    async def __aexit__(self, *exc):
+        return await self.ctx.__aexit__(*exc)
+
+class ThrottledSession:
+    """ClientSession whose requests are scheduled by the per-host token buckets."""
+    def __init__(self, net, session):
+        self.net     = net
+        self.session = session
+
+    def request(self, method, url, **kwargs):
+        return _Throttled(self.net, self.session, method, url, kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def __aenter__(self):
+        await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self.session.__aexit__(*exc)
+
+class NetworkLayer:
+    """
+    Shared HTTP layer: one tuned TCPConnector (keep-alive, DNS cache,
+    per-host connection cap) plus a token bucket and counters per host.
+    session() wraps the ClientSession so each request takes its host's
+    token before it starts (outside its timeout); the counters hook into
+    aiohttp's request tracing.
+    """
+    def __init__(self, cfg):
+        self.cfg     = cfg
+        self.buckets = {}
+        self.stats   = {}
+
+    def _host(self, url):
+        return url.host or ''
+
+    def _bucket(self, host):
+        b = self.buckets.get(host)
+        if b is None:
+            b = self.buckets[host] = TokenBucket(self.cfg['host_rate'], self.cfg['host_burst'])
+        return b
+
+    def _stat(self, host):
+        s = self.stats.get(host)
+        if s is None:
+            s = self.stats[host] = {
+                'requests': 0, 'ok': 0, 'errors': 0, 'status_429': 0,
+                'bytes': 0, 'latency_total': 0.0, 'throttle_wait': 0.0,
+            }
+        return s
+
+    async def throttle(self, host):
+        """Waits for a request token for `host`."""
+        t0 = time.monotonic()
+        await self._bucket(host).acquire()
+        self._stat(host)['throttle_wait'] += time.monotonic() - t0
+
+    async def _on_start(self, session, ctx, params):
+        ctx.host  = self._host(params.url)
+        ctx.start = time.monotonic()
+        self._stat(ctx.host)['requests'] += 1
+
+    async def _on_end(self, session, ctx, params):
+        st = self._stat(ctx.host)
+        latency = time.monotonic() - ctx.start
+        st['latency_total'] += latency
+        get_metrics().observe_host(ctx.host, latency)
+        status = params.response.status
+        if status == 429:
+            st['status_429'] += 1
+            retry_after = parse_retry_after(params.response.headers.get('Retry-After'))
+            self._bucket(ctx.host).throttled(retry_after)
+        elif status < 400:
+            st['ok'] += 1
+            self._bucket(ctx.host).ok()
+        else:
+            st['errors'] += 1
+
+    async def _on_exception(self, session, ctx, params):
+        if hasattr(ctx, 'host'):
+            self._stat(ctx.host)['errors'] += 1
+
+    async def _on_chunk(self, session, ctx, params):
+        if hasattr(ctx, 'host'):
+            self._stat(ctx.host)['bytes'] += len(params.chunk)
+            get_metrics().add_host_bytes(ctx.host, len(params.chunk))
+
+    def session(self):
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_start)
+        trace.on_request_end.append(self._on_end)
+        trace.on_request_exception.append(self._on_exception)
+        trace.on_response_chunk_received.append(self._on_chunk)
+        connector = aiohttp.TCPConnector(
+            limit=self.cfg['http_pool_limit'],
+            limit_per_host=self.cfg['http_per_host_limit'],
+            ttl_dns_cache=self.cfg['dns_cache_ttl'],
+            keepalive_timeout=30,
+        )
+        return ThrottledSession(
+            self, aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+        )
+
+    def host_stats(self):
+        """Per-host counters, with mean latency and the current request rate."""
+        out = {}
+        for host, s in self.stats.items():
+            r = dict(s)
+            r['latency_avg'] = s['latency_total'] / s['requests'] if s['requests'] else 0.0
+            r['rate'] = self.buckets[host].rate if host in self.buckets else None
+            out[host] = r
+        return out
+
+    def write_stats(self, path):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.host_stats(), f, indent=2)
@@ -2,80 +2,398 @@
 
 import re
 import os
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-from fetcher import fetch
+
+try:
+    from lxml import etree
+except ImportError:  # fall back to the BeautifulSoup walker
+    etree = None
 
 CSS_URL = re.compile(r'url\((?:["\']?)(.*?)(?:["\']?)\)')
 
-async def extract_image_urls(html, base, session, retries, timeout):
+ALLOWED = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.avif', '.heic')
+LAZY_ATTRS = (
+    'data-srcset','data-src','data-lazy','data-original',
+    'data-lazy-image','data-img','data-deferred'
+)
+# lazy-loaded backgrounds / full-size images on elements other than <img>
+BG_ATTRS = (
+    'data-bg','data-background','data-background-image','data-bg-src',
+    'data-src','data-original','data-image','data-img','data-lazy-bg',
+    'data-full','data-zoom-image','data-large_image'
+)
+BGSET_ATTRS = ('data-bgset','data-srcset')
+# meta tags naming the page's representative image
+META_IMAGE = (
+    'og:image','og:image:url','og:image:secure_url',
+    'twitter:image','twitter:image:src','image'
+)
+# JSON-LD keys whose values are images (an ImageObject's `url` included)
+LD_IMAGE_KEYS = ('image','contentUrl','thumbnailUrl')
+# inline scripts carrying framework state worth mining
+STATE_IDS    = ('__NEXT_DATA__','__NUXT_DATA__')
+STATE_MARKER = re.compile(
+    r'__(?:INITIAL|PRELOADED|APOLLO)_STATE__|__NUXT__|__NEXT_DATA__|__INITIAL_PROPS__'
+)
+# absolute URLs inside JSON / JS strings, slashes possibly escaped
+JS_URL = re.compile(r'https?:(?:\\?/|\\u002[fF]){2}[^"\'\s<>]+')
+
+# documents larger than this are parsed in a worker process
+_process_threshold = 1024 * 1024
+_process_pool = None
+
+def configure_parse_pool(workers, threshold):
+    global _process_pool, _process_threshold
+    shutdown_parse_pool()
+    _process_threshold = threshold
+    if workers:
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+
+def shutdown_parse_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def _is_http(u):
+    return u.lower().startswith(('http://','https://'))
+
+_JOIN_UNSAFE = re.compile(r'[#;\[\t\r\n]|\?$')
+
+def _join(base, u):
+    """
+    urljoin, minus the parse/unparse round trip for already-absolute
+    http(s) URLs that it would return unchanged (the bulk of candidates).
+    """
+    if u.startswith(('http://','https://')) and not _JOIN_UNSAFE.search(u):
+        return u
+    return urljoin(base, u)
+
+def _is_image(u: str) -> bool:
+    u = u.lower().split('?',1)[0]
+    return u.endswith(ALLOWED)
+
+def _px(val):
+    """Declared pixel size from a width/height attribute ('300', '300px'), else None."""
+    val = (val or '').strip().lower()
+    if val.endswith('px'):
+        val = val[:-2]
+    try:
+        n = float(val)
+    except ValueError:
+        return None
+    return n if n > 0 else None
+
+class _Group:
+    """
+    All URL variants of one element (an <img>, a lone <source>, or a whole
+    <picture>), as (url, w_descriptor, x_descriptor), plus declared size.
+    """
+    __slots__ = ('cands', 'width', 'height')
+
+    def __init__(self):
+        self.cands  = []
+        self.width  = None
+        self.height = None
+
+    def add_srcset(self, srcset, base):
+        for part in srcset.split(','):
+            bits = part.strip().split()
+            if not bits or not _is_http(bits[0]):
+                continue
+            w, x = None, 1.0
+            for d in bits[1:]:
+                d = d.lower()
+                try:
+                    if d.endswith('w'):
+                        w = int(float(d[:-1]))
+                    elif d.endswith('x'):
+                        x = float(d[:-1])
+                except ValueError:
+                    pass
+            self.cands.append((_join(base, bits[0]), w, x))
+
+    def add_url(self, u, base):
+        if u and _is_http(u):
+            self.cands.append((_join(base, u), None, 1.0))
+
+    def add_img(self, attrs, base):
+        """srcset, lazy data-* attributes, then src (earlier wins ties)."""
+        if attrs.get('srcset'):
+            self.add_srcset(attrs['srcset'], base)
+        for attr in LAZY_ATTRS:
+            val = attrs.get(attr)
+            if val and attr.endswith('srcset'):
+                self.add_srcset(val, base)
+            else:
+                self.add_url(val, base)
+        self.add_url(attrs.get('src'), base)
+        self.width  = _px(attrs.get('width')) or self.width
+        self.height = _px(attrs.get('height')) or self.height
+
+    def add_source(self, attrs, base):
+        if attrs.get('srcset'):
+            self.add_srcset(attrs['srcset'], base)
+        else:
+            self.add_url(attrs.get('src'), base)
+
+    def pick(self, min_size=None):
+        """
+        The single best variant: largest `w` descriptor if any candidate
+        has one, else the largest `x` density. None if nothing is an image
+        or the declared size is already below `min_size`.
+        """
+        cands = [c for c in self.cands if _is_image(c[0])]
+        if not cands:
+            return None
+        if any(c[1] for c in cands):
+            best = max(cands, key=lambda c: c[1] or 0)
+            if min_size and best[1] and best[1] < min_size[0]:
+                return None
+            return best[0]
+        best = max(cands, key=lambda c: c[2])
+        if min_size and self.width and self.height:
+            if self.width * best[2] < min_size[0] or self.height * best[2] < min_size[1]:
+                return None
+        return best[0]
+
+def _add_style(out, style, base):
+    for match in CSS_URL.findall(style):
+        u = _join(base, match)
+        if not _is_http(u):
+            continue
+        ext = os.path.splitext(u.lower().split('?',1)[0])[1]
+        if ext in ALLOWED:
+            out.append(u)
+
+def _unescape_js(u):
+    u = u.replace('\\u002F', '/').replace('\\u002f', '/').replace('\\/', '/')
+    return u.replace('\\u0026', '&').replace('\\u003D', '=').rstrip('\\')
+
+def _ld_images(node, out, key=None):
+    """String values under LD_IMAGE_KEYS, including an ImageObject's `url`."""
+    if isinstance(node, dict):
+        for k, v in node.items():
+            _ld_images(v, out, k if k in LD_IMAGE_KEYS else (key if k == 'url' else None))
+    elif isinstance(node, list):
+        for v in node:
+            _ld_images(v, out, key)
+    elif isinstance(node, str) and key:
+        out.append(node)
+
+class _Embedded:
+    """
+    Image URLs a browser would only surface by running the page: og:image /
+    twitter:image meta, JSON-LD, framework state blobs (__NEXT_DATA__,
+    window.__INITIAL_STATE__ ...) and lazy backgrounds on non-<img>
+    elements. `declared` URLs (meta, JSON-LD image fields) are trusted
+    without an image extension; everything mined from scripts or data-*
+    attributes still has to look like an image.
+    """
+    __slots__ = ('base', 'urls')
+
+    def __init__(self, base):
+        self.base = base
+        self.urls = []
+
+    def _add(self, u, declared=False):
+        u = (u or '').strip()
+        if not u or u.startswith('data:'):
+            return
+        u = _join(self.base, u)
+        if _is_http(u) and (declared or _is_image(u)):
+            self.urls.append(u)
+
+    def element(self, tag, attrs):
+        if tag == 'meta':
+            prop = (attrs.get('property') or attrs.get('name') or attrs.get('itemprop') or '').lower()
+            if prop in META_IMAGE:
+                self._add(attrs.get('content'), True)
+            return
+        if tag == 'link':
+            rel = attrs.get('rel') or ''
+            if 'image_src' in (rel.split() if isinstance(rel, str) else rel):
+                self._add(attrs.get('href'), True)
+            return
+        if tag in ('img', 'source', 'script', 'iframe'):
+            return
+        for attr in BG_ATTRS:
+            val = attrs.get(attr)
+            if not val:
+                continue
+            if 'url(' in val:
+                _add_style(self.urls, val, self.base)
+            else:
+                self._add(val)
+        for attr in BGSET_ATTRS:
+            val = attrs.get(attr)
+            if val:
+                for part in val.split(','):
+                    bits = part.split()
+                    if bits:
+                        self._add(bits[0])
+
+    def script(self, attrs, text):
+        """Mines an inline script; only JSON payloads and framework state are read."""
+        if not text or attrs.get('src'):
+            return
+        typ = (attrs.get('type') or '').lower()
+        if typ == 'application/ld+json':
+            try:
+                found = []
+                _ld_images(json.loads(text), found)
+                for u in found:
+                    self._add(u, True)
+            except ValueError:
+                pass
+        elif not (typ == 'application/json' or attrs.get('id') in STATE_IDS
+                  or STATE_MARKER.search(text)):
+            return
+        for m in JS_URL.findall(text):
+            self._add(_unescape_js(m))
+
+class _Collector:
+    """
+    lxml parser target: sees every start tag once, in a single pass, without
+    building a tree. Candidates are bucketed so the result order matches
+    the BeautifulSoup walker (<picture>/<source>, then <img>, then styles,
+    then embedded data). Script text arrives through data() and is mined
+    at its end tag.
+    """
+    def __init__(self, base):
+        self.base     = base
+        self.sources  = []
+        self.imgs     = []
+        self.styles   = []
+        self.css      = []
+        self.embedded = _Embedded(base)
+        self.picture  = None
+        self.script   = None
+
+    def start(self, tag, attrib):
+        if tag == 'picture':
+            self.picture = _Group()
+            self.sources.append(self.picture)
+        elif tag == 'source':
+            g = self.picture
+            if g is None:
+                g = _Group()
+                self.sources.append(g)
+            g.add_source(attrib, self.base)
+        elif tag == 'img':
+            g = self.picture
+            if g is None:
+                g = _Group()
+                self.imgs.append(g)
+            g.add_img(attrib, self.base)
+        elif tag == 'link':
+            href = attrib.get('href')
+            if href and 'stylesheet' in (attrib.get('rel') or '').split() and _is_http(href):
+                self.css.append(_join(self.base, href))
+        elif tag == 'script':
+            self.script = (attrib, [])
+        if 'style' in attrib:
+            _add_style(self.styles, attrib['style'], self.base)
+        self.embedded.element(tag, attrib)
+
+    def end(self, tag):
+        if tag == 'picture':
+            self.picture = None
+        elif tag == 'script' and self.script is not None:
+            attrib, text = self.script
+            self.script = None
+            self.embedded.script(attrib, ''.join(text))
+
+    def data(self, data):
+        if self.script is not None:
+            self.script[1].append(data)
+
+    def close(self):
+        return self
+
+def _extract_lxml(html, base, min_size=None):
+    c = _Collector(base)
+    parser = etree.HTMLParser(target=c, recover=True, no_network=True)
+    parser.feed(html)
+    parser.close()
+    return _finalize(c.sources + c.imgs, c.styles, c.css, min_size, c.embedded.urls)
+
+def _extract_bs4(html, base, min_size=None):
+    """The multi-pass BeautifulSoup walker (fallback and benchmark baseline)."""
     soup = BeautifulSoup(html, 'html.parser')
-    img_urls = []
-
-    # 0) <picture> / <source> tags
-    for source in soup.find_all('source'):
-        if source.get('srcset'):
-            for u in source['srcset'].split(','):
-                candidate = u.strip().split(' ')[0]
-                if candidate.lower().startswith(('http://','https://')):
-                    img_urls.append(urljoin(base, candidate))
-        elif source.get('src'):
-            src = source['src']
-            if src.lower().startswith(('http://','https://')):
-                img_urls.append(urljoin(base, src))
-
-    # 1) <img> variants
-    for img in soup.find_all('img'):
-        # srcset
-        if img.get('srcset'):
-            for u in img['srcset'].split(','):
-                candidate = u.strip().split(' ')[0]
-                if candidate.lower().startswith(('http://','https://')):
-                    img_urls.append(urljoin(base, candidate))
-        # various data-* attributes
-        for attr in (
-            'data-srcset','data-src','data-lazy','data-original',
-            'data-lazy-image','data-img','data-deferred'
-        ):
-            if img.get(attr):
-                val = img[attr]
-                if val.lower().startswith(('http://','https://')):
-                    img_urls.append(urljoin(base, val))
-        # plain src
-        if img.get('src'):
-            src = img['src']
-            if src.lower().startswith(('http://','https://')):
-                img_urls.append(urljoin(base, src))
+    sources, imgs = [], []
+    pictures = {}
+
+    def group_for(el, bucket):
+        pic = el.find_parent('picture')
+        if pic is None:
+            g = _Group()
+            bucket.append(g)
+            return g
+        if id(pic) not in pictures:
+            pictures[id(pic)] = _Group()
+            sources.append(pictures[id(pic)])
+        return pictures[id(pic)]
+
+    # 0) <picture> / <source> tags, then 1) <img> variants
+    for el in soup.find_all(['source', 'img']):
+        if el.name == 'source':
+            group_for(el, sources).add_source(el.attrs, base)
+        else:
+            group_for(el, imgs).add_img(el.attrs, base)
 
     # 2) inline style backgrounds (filter fonts, data URIs)
-    ALLOWED = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.avif', '.heic')
+    styles = []
     for tag in soup.select('[style]'):
-        for match in CSS_URL.findall(tag['style']):
-            u = urljoin(base, match)
-            if not u.lower().startswith(('http://','https://')):
-                continue
-            ext = os.path.splitext(u.lower().split('?',1)[0])[1]
-            if ext in ALLOWED:
-                img_urls.append(u)
+        _add_style(styles, tag['style'], base)
 
     # 3) external CSS links
     css_links = []
     for link in soup.find_all('link', rel=lambda x: x and 'stylesheet' in x):
         href = link.get('href')
-        if href and href.lower().startswith(('http://','https://')):
-            css_links.append(urljoin(base, href))
+        if href and _is_http(href):
+            css_links.append(_join(base, href))
 
-    # dedupe URLs while preserving order
-    seen = set()
-    img_urls = [u for u in img_urls if u not in seen and not seen.add(u)]
+    # 4) embedded data: meta, JSON-LD / state scripts, lazy backgrounds
+    embedded = _Embedded(base)
+    for el in soup.find_all(True):
+        embedded.element(el.name, el.attrs)
+        if el.name == 'script':
+            embedded.script(el.attrs, el.string or '')
+
+    return _finalize(sources + imgs, styles, css_links, min_size, embedded.urls)
+
+def _finalize(groups, styles, css_links, min_size=None, embedded=()):
+    # one URL per element, then inline-style backgrounds
+    img_urls = [u for u in (g.pick(min_size) for g in groups) if u] + styles
 
     # final extension check
-    def _is_image(u: str) -> bool:
-        u = u.lower().split('?',1)[0]
-        return u.endswith((
-            '.jpg','.jpeg','.png','.gif','.bmp','.webp',
-            '.avif','.heic'
-        ))
     img_urls = [u for u in img_urls if _is_image(u)]
 
+    # embedded candidates last (already filtered; declared ones may lack an extension)
+    img_urls += embedded
+
+    # dedupe URLs while preserving order
+    seen = set()
+    img_urls = [u for u in img_urls if u not in seen and not seen.add(u)]
+
     return img_urls, css_links
+
+def extract_sync(html, base, min_size=None):
+    if etree is not None:
+        return _extract_lxml(html, base, min_size)
+    return _extract_bs4(html, base, min_size)
+
+async def extract_image_urls(html, base, session, retries, timeout, min_size=None):
+    """
+    Returns (img_urls, css_links), with one URL per element. Parsing never
+    runs on the event loop: large documents go to the process pool, the
+    rest to the default executor.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _process_pool if _process_pool is not None and len(html) > _process_threshold else None
+    return await loop.run_in_executor(pool, extract_sync, html, base, min_size)
@@ -0,0 +1,63 @@
+# image_scraper/phash.py
+
+import numpy as np
+from PIL import Image
+
+def dhash(path, size=8):
+    """
+    64-bit difference hash: compares neighbouring pixels of a (size+1)xsize
+    grayscale thumbnail, so resized or re-encoded copies hash (nearly) alike.
+    """
+    with Image.open(path) as img:
+        # JPEG can decode straight at a fraction of full size
+        img.draft('L', (size * 4, size * 4))
+        thumb = img.convert('L').resize((size + 1, size), Image.LANCZOS)
+    px   = np.asarray(thumb, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance: a lookup within radius r
+    only visits children whose edge distance is in [d-r, d+r] instead of
+    scanning every stored hash.
+    """
+    def __init__(self):
+        self.root = None  # [hash, {distance: child}]
+        self.size = 0
+
+    def add(self, h):
+        if self.root is None:
+            self.root = [h, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [h, {}]
+                self.size += 1
+                return
+            node = child
+
+    def find(self, h, radius):
+        """A stored hash within `radius` of `h`, or None."""
+        if self.root is None:
+            return None
+        stack = [self.root]
+        while stack:
+            val, kids = stack.pop()
+            d = hamming(h, val)
+            if d <= radius:
+                return val
+            for k in range(max(1, d - radius), d + radius + 1):
+                child = kids.get(k)
+                if child is not None:
+                    stack.append(child)
+        return None
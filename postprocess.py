@@ -0,0 +1,91 @@
+# image_scraper/postprocess.py
+
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+try:  # HEIC/HEIF decoding is a plugin
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+EXTS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png', 'AVIF': '.avif'}
+
+_pool = None
+_opts = None
+
+def configure_postprocess(cfg):
+    """Starts the worker processes; no-op (stage disabled) when postprocess_workers is 0."""
+    global _pool, _opts
+    shutdown_postprocess()
+    if cfg['postprocess_workers']:
+        _pool = ProcessPoolExecutor(max_workers=cfg['postprocess_workers'])
+        _opts = (cfg['postprocess_max_dim'], cfg['postprocess_format'], cfg['postprocess_quality'])
+
+def shutdown_postprocess():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+def enabled():
+    return _pool is not None
+
+def postprocess(path, max_dim, fmt, quality):
+    """
+    Runs in a worker process. Fully decodes the image (so truncated files
+    fail here rather than pass on their header), applies the EXIF
+    orientation, downscales to `max_dim`, and re-encodes as `fmt` (None
+    keeps the source format) without EXIF. Untouched files are left as is.
+    Returns (ok, error, out_path, (width, height)).
+    """
+    try:
+        with Image.open(path) as img:
+            src_fmt = img.format
+            img.load()
+            has_exif = bool(img.getexif())
+            icc = img.info.get('icc_profile')
+            out = ImageOps.exif_transpose(img)
+    except Exception as e:
+        return False, f'decode_error:{e}', path, None
+
+    target  = (fmt or src_fmt or 'JPEG').upper()
+    resized = max_dim and max(out.size) > max_dim
+    if not (resized or has_exif or target != src_fmt):
+        return True, '', path, out.size
+
+    # some encoders fall back to the metadata kept in .info
+    for key in ('exif', 'xmp', 'XML:com.adobe.xmp'):
+        out.info.pop(key, None)
+    if resized:
+        out.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    if target == 'JPEG' and out.mode not in ('RGB', 'L'):
+        if out.mode in ('RGBA', 'LA', 'P'):
+            rgba = out.convert('RGBA')
+            flat = Image.new('RGB', rgba.size, (255, 255, 255))
+            flat.paste(rgba, mask=rgba.getchannel('A'))
+            out = flat
+        else:
+            out = out.convert('RGB')
+
+    dest = os.path.splitext(path)[0] + EXTS.get(target, '.' + target.lower())
+    part = dest + '.part'
+    try:
+        params = {'quality': quality} if target in ('JPEG', 'WEBP', 'AVIF') else {}
+        if icc:
+            params['icc_profile'] = icc
+        out.save(part, format=target, **params)
+        os.replace(part, dest)
+    except Exception as e:
+        try: os.remove(part)
+        except OSError: pass
+        return False, f'encode_error:{e}', path, None
+    if dest != path:
+        os.remove(path)
+    return True, '', dest, out.size
+
+async def run_postprocess(path):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, postprocess, path, *_opts)
@@ -1,24 +1,11 @@
 # image_scraper/processor.py
 
-import os
-from openpyxl import Workbook, load_workbook
-from config_manager import update_last_row
 from processor_core import RowProcessor
+from metrics import get_metrics, span
 
-def append_to_excel(path, entries):
-    if not os.path.exists(path):
-        wb = Workbook()
-        ws = wb.active
-        ws.append(['row','activity_id','url','file','status','error'])
-    else:
-        wb = load_workbook(path)
-        ws = wb.active
-    for e in entries:
-        ws.append([e['row'], e['activity_id'], e['url'],
-                   e['file'], e['status'], e['error']])
-    wb.save(path)
-
-async def process_row(session, idx, type_, activity_id, website, summary, cfg):
+async def process_row(session, idx, type_, activity_id, website, log, summary, cfg,
+                      download_sem=None, index=None, shared_near=None, archive=None,
+                      strategy=None):
     # 1) prepare per-row log
     log_rows = []
 
@@ -30,12 +17,21 @@ async def process_row(session, idx, type_, activity_id, website, summary, cfg):
         activity_id=activity_id,
         website=website,
         cfg=cfg,
-        log_rows=log_rows
+        log_rows=log_rows,
+        download_sem=download_sem,
+        index=index,
+        shared_near=shared_near,
+        archive=archive,
+        strategy=strategy
     )
-    await rp.run()
+    with get_metrics().row(idx):
+        await rp.run()
 
-    # 3) write out log & summary & advance pointer
-    append_to_excel(cfg['log_excel'], log_rows)
-    summary.append({'row': idx, 'successes': rp.success, 'failures': rp.failures})
-    update_last_row(idx)
-    print(f"Row {idx} (ID {activity_id}): {rp.success} succeeded, {rp.failures} failed")
+        # 3) write out log & summary (the scheduler advances the pointer)
+        with span('log_write'):
+            log.extend(log_rows)
+            summary.append({'row': idx, 'successes': rp.success, 'failures': rp.failures,
+                            'attempts': rp.attempts})
+    print(f"Row {idx} (ID {activity_id}): {rp.success} succeeded, {rp.failures} failed "
+          f"({rp.attempts} download attempts)")
+    return rp
@@ -1,18 +1,30 @@
 # image_scraper/processor_core.py
 
 import asyncio
+import contextlib
+import collections
 import os
 import uuid
+import shutil
 import logging
-import hashlib
-from urllib.parse import urljoin
 from fetcher import fetch
-from parser import extract_image_urls, CSS_URL
-from downloader import download_image
-from dynamic_fetcher import fetch_all_images_with_selenium
+from parser import extract_image_urls
+from css_fetcher import prefetch_css
+from downloader import download_image, needs_sniff, big_enough
+from image_index import outcome_of, PERMANENT
+from retry import get_policy
+from phash import dhash, BKTree
+from postprocess import enabled as postprocess_enabled, run_postprocess
+from dynamic_fetcher import fetch_all_images_with_selenium, get_pool
+from metrics import span, count
+from strategy_cache import domain_of
+from crawl_frontier import CrawlFrontier
+from write_behind import get_mover
 
 class RowProcessor:
-    def __init__(self, session, idx, type_, activity_id, website, cfg, log_rows):
+    def __init__(self, session, idx, type_, activity_id, website, cfg, log_rows,
+                 download_sem=None, index=None, shared_near=None, archive=None,
+                 strategy=None):
         self.session      = session
         self.idx          = idx
         self.type         = type_
@@ -25,53 +37,94 @@ class RowProcessor:
         self.css_links    = []
         self.success      = 0
         self.failures     = 0
+        self.attempts     = 0
         self.dedup_hashes = set()
+        self.near_hashes  = BKTree()
 
         self.sem           = asyncio.Semaphore(cfg['download_concurrency'])
+        # run-wide cap shared by every row in flight (optional)
+        self.download_sem  = download_sem
+        # persistent cross-row / cross-run image index (optional)
+        self.index         = index
+        # run-wide perceptual-hash tree for cross-row near-dups (optional)
+        self.shared_near   = shared_near
+        # offline candidate archive (optional) and url -> (stage, seq)
+        self.archive       = archive
+        self.found         = {}
+        # per-domain strategy record (optional), stages run / images kept
+        self.strategy      = strategy
+        self.plan          = {}
+        self.ran           = set()
+        self.kept          = {}
         self.filename_lock = asyncio.Lock()
+        # one store at a time per row: a store may rewrite the file another
+        # one is about to link from
+        self.store_lock    = asyncio.Lock()
         self.loop          = asyncio.get_event_loop()
         self.dynamic_used  = False
+        self.dynamic_task  = None
+        self.css_task      = None
+        # same-site crawl (optional): its images queue up in crawl_new
+        self.crawl_task    = None
+        self.crawl_new     = collections.deque()
+        self.crawl_wake    = asyncio.Event()
 
         # will be set after static fetch
         self.url_iter = None
 
-        # allowed extensions for CSS filtering
-        self._allowed_exts = (
-            '.jpg', '.jpeg', '.png', '.gif',
-            '.bmp', '.webp', '.avif', '.heic'
-        )
-
     async def run(self):
         # 1) skip if no website
         if not isinstance(self.website, str) or not self.website.strip():
-            self.log_rows.append({
-                'row': self.idx,
-                'activity_id': self.activity_id,
-                'url': self.website,
-                'file': '',
-                'status': 'no_website',
-                'error': ''
-            })
+            self._log(self.website, '', 'no_website', '')
             return
 
-        # 2) static fetch + parse
-        html, ferr = await fetch(
-            self.session, self.website,
-            self.cfg['request_retries'],
-            self.cfg['timeout']
-        )
+        domain = domain_of(self.website)
+        if self.strategy is not None:
+            self.plan = self.strategy.plan(domain)
+
+        # 2) static fetch + parse (skipped on domains where only Selenium works)
+        html = ferr = None
+        if not self.plan.get('skip_static'):
+            with span('html_fetch') as s:
+                html, ferr = await fetch(
+                    self.session, self.website,
+                    self.cfg['request_retries'],
+                    self.cfg['timeout']
+                )
+                s.bytes = len(html) if html else 0
         if html:
-            self.urls, self.css_links = await extract_image_urls(
-                html, self.website, self.session,
-                self.cfg['request_retries'],
-                self.cfg['timeout']
-            )
-        else:
+            self.ran.add('static')
+            with span('parse'):
+                self.urls, self.css_links = await extract_image_urls(
+                    html, self.website, self.session,
+                    self.cfg['request_retries'],
+                    self.cfg['timeout'],
+                    self.cfg['min_image_size']
+                )
+        elif ferr:
             logging.info(f"[Row {self.idx}] static fetch failed ({ferr}); deferring to Selenium")
-            self.urls, self.css_links = [], []
+        self._found(self.urls, 'static')
 
         # initialize iterator
-        self.url_iter = iter(self.urls)
+        # over a copy: crawled URLs are appended to self.urls but handed out
+        # through crawl_new only
+        self.url_iter = iter(list(self.urls))
+
+        # fetch every stylesheet in the background while static URLs download
+        if self.css_links and not self.plan.get('skip_css'):
+            self.css_task = asyncio.create_task(self._prefetch_css())
+
+        # crawl gallery-like pages of the same site when the landing page
+        # can't fill the quota; their images join the download queue as
+        # each page is parsed
+        if (html and self.cfg['crawl_max_pages'] and not self.plan.get('skip_crawl')
+                and self._static_count() < self.cfg['max_images_per_site']):
+            self._start_crawl(html)
+
+        # start the browser now, alongside the static downloads, when it
+        # looks like it will be needed
+        if self.cfg['speculative_dynamic'] and self._needs_dynamic(html):
+            self._start_dynamic()
 
         # 3) spawn initial download workers
         tasks = set()
@@ -79,7 +132,7 @@ class RowProcessor:
             u = await self._get_next_url()
             if not u:
                 break
-            tasks.add(asyncio.create_task(self._worker_with_sem(u)))
+            tasks.add(asyncio.create_task(self._run_worker(u)))
 
         # 4) wait for completion or quota
         while tasks:
@@ -93,6 +146,74 @@ class RowProcessor:
                     t.cancel()
                 break
 
+        for t in (self.css_task, self.crawl_task, self.dynamic_task):
+            if t is not None:
+                t.cancel()
+        if self.strategy is not None:
+            self.strategy.record(domain, self.ran, self.kept)
+
+    def _static_count(self):
+        return sum(1 for u in self.urls if u.lower().startswith(('http://', 'https://')))
+
+    def _needs_dynamic(self, html):
+        if self.plan.get('skip_selenium'):
+            return False
+        # a running crawl gets the first chance to fill the quota
+        return (
+            not html
+            or (self._static_count() < self.cfg['max_images_per_site'] and self.crawl_task is None)
+            or self.plan.get('selenium_useful', False)
+        )
+
+    def _start_crawl(self, html):
+        self.ran.add('crawl')
+        frontier = CrawlFrontier(self.session, self.website, self.cfg, self._crawled)
+        self.crawl_task = asyncio.create_task(self._crawl(frontier, html))
+
+    async def _crawl(self, frontier, html):
+        try:
+            with span('crawl'):
+                await frontier.run(html)
+        except Exception as e:
+            logging.warning(f"[Row {self.idx}] crawl error: {e}")
+        finally:
+            self.crawl_wake.set()
+
+    def _crawled(self, urls):
+        new = [u for u in urls if u not in self.found]
+        self._found(new, 'crawl')
+        self.urls.extend(new)
+        self.crawl_new.extend(new)
+        self.crawl_wake.set()
+
+    def _start_dynamic(self):
+        self.dynamic_used = True
+        self.dynamic_task = asyncio.create_task(self._dynamic())
+
+    async def _dynamic(self):
+        # the whole harvest (no cap): downloads stop at the quota anyway, and
+        # candidates rejected later (too small, duplicates) don't leave the
+        # row short
+        try:
+            # checks a driver out of the shared pool on its own executor
+            with span('selenium'):
+                return await self.loop.run_in_executor(
+                    get_pool().executor,
+                    fetch_all_images_with_selenium,
+                    self.website, None, self.cfg['min_image_size']
+                )
+        except Exception as e:
+            logging.warning(f"[Row {self.idx}] Selenium fetch error: {e}")
+            return []
+
+    async def _prefetch_css(self):
+        with span('css_fetch'):
+            return await prefetch_css(
+                self.session, self.css_links,
+                self.cfg['request_retries'], self.cfg['timeout'],
+                self.cfg['css_fetch_concurrency'], self.cfg['css_import_depth']
+            )
+
     async def _get_next_url(self):
         # a) from static list, only http(s)
         while True:
@@ -104,138 +225,363 @@ class RowProcessor:
                 continue
             return url
 
-        # b) from CSS-linked files (once at a time)
-        if self.css_links:
-            css_url = self.css_links.pop(0)
-            css_txt, _ = await fetch(
-                self.session, css_url,
-                self.cfg['request_retries'],
-                self.cfg['timeout']
-            )
-            if css_txt:
-                raw = CSS_URL.findall(css_txt)
-                new = []
-                for m in raw:
-                    u = urljoin(css_url, m)
-                    if not u.lower().startswith(('http://','https://')):
-                        continue
-                    ext = os.path.splitext(u.lower().split('?',1)[0])[1]
-                    if ext in self._allowed_exts:
-                        new.append(u)
-                if new:
-                    self.urls.extend(new)
-                    self.url_iter = iter(new)
-                    return await self._get_next_url()
-
-        # c) on-demand Selenium batch (once only)
-        if not self.dynamic_used and self.success < self.cfg['max_images_per_site']:
-            self.dynamic_used = True
-            needed = self.cfg['max_images_per_site'] - self.success
-            batch  = min(self.cfg['download_concurrency'], needed)
+        # b) from CSS-linked files (prefetched concurrently since the parse)
+        task = self.css_task
+        if task is not None:
             try:
-                extra = await self.loop.run_in_executor(
-                    None,
-                    fetch_all_images_with_selenium,
-                    self.website, batch
-                )
+                new = await task
             except Exception as e:
-                logging.warning(f"[Row {self.idx}] Selenium fetch error: {e}")
-                return None
+                logging.warning(f"[Row {self.idx}] CSS prefetch error: {e}")
+                new = []
+            # several workers may be waiting here; only the first merges
+            if self.css_task is task:
+                self.css_task = None
+                self.ran.add('css')
+                new = [u for u in new if u not in self.urls]
+                self._found(new, 'css')
+                self.urls.extend(new)
+                self.url_iter = iter(new)
+            return await self._get_next_url()
+
+        # c) images from crawled pages, as they arrive
+        while self.crawl_new or self.crawl_task is not None:
+            if self.crawl_new:
+                return self.crawl_new.popleft()
+            if self.crawl_task.done():
+                self.crawl_task = None
+                break
+            self.crawl_wake.clear()
+            await self.crawl_wake.wait()
 
-            # only HTTP(s) here
-            filtered = [u for u in extra if u.lower().startswith(('http://','https://'))]
-            new = [u for u in filtered if u not in self.urls]
-            if new:
+        # d) the Selenium harvest: started early when predicted, else now
+        #    (once only)
+        if (not self.dynamic_used and not self.plan.get('skip_selenium')
+                and self.success < self.cfg['max_images_per_site']):
+            self._start_dynamic()
+        task = self.dynamic_task
+        if task is not None:
+            extra = await task
+            if self.dynamic_task is task:
+                self.dynamic_task = None
+                self.ran.add('selenium')
+                # only HTTP(s) here
+                filtered = [u for u in extra if u.lower().startswith(('http://','https://'))]
+                new = [u for u in filtered if u not in self.urls]
+                self._found(new, 'selenium')
                 self.urls.extend(new)
                 self.url_iter = iter(new)
-                return await self._get_next_url()
+            return await self._get_next_url()
 
         return None
 
-    async def _worker_with_sem(self, url):
+    async def _run_worker(self, url):
+        await self._worker(url)
+
+        # schedule next if quota not met (may fetch CSS or launch Selenium)
+        if self.success < self.cfg['max_images_per_site']:
+            nxt = await self._get_next_url()
+            if nxt:
+                return asyncio.create_task(self._run_worker(nxt))
+
+        return None
+
+    @contextlib.asynccontextmanager
+    async def _download_slot(self):
+        # held only for the transfer, so hashing and post-processing of one
+        # image overlap the downloads of the next
         async with self.sem:
-            return await self._worker(url)
+            if self.download_sem is None:
+                yield
+            else:
+                async with self.download_sem:
+                    yield
 
     async def _worker(self, url):
-        # HEAD-check (warn only)
-        parts = url.lower().split('?')[0].rsplit('.', 1)
-        if not (len(parts) > 1 and parts[-1] in self._allowed_exts):
-            try:
-                hd = await self.session.head(url, timeout=self.cfg['timeout'])
-                ct = hd.headers.get('Content-Type','')
-                if not ct.startswith('image/'):
-                    logging.warning(f"[Row {self.idx}] HEAD non-image: {ct}")
-            except Exception as e:
-                logging.warning(f"[Row {self.idx}] HEAD error: {e}")
+        # known URL: replay its outcome without touching the network
+        if self.index is not None and await self._from_index(url):
+            return
 
-        # download + retry
+        # download; transient errors are retried by the shared policy,
+        # content rejections (too_small, pil_error, ...) are final
         ext      = os.path.splitext(url)[1].split('?')[0] or '.jpg'
         tmp_name = f"tmp_{uuid.uuid4().hex}{ext}"
-        tmp_path = os.path.join(self.cfg['output_dir'], tmp_name)
-        ok = False
-        err = ''
+        # downloads land in the local staging area when the write-behind
+        # mover is on, and only the finished file goes to output_dir
+        mover    = get_mover()
+        tmp_path = os.path.join(mover.staging if mover else self.cfg['output_dir'], tmp_name)
+        h = size = None
+        attempts = 0
+        # with an archive, smaller images are kept too (for reprocessing
+        # with a lower minimum) and only rejected after archiving
+        min_size = self.cfg['archive_min_size'] if self.archive is not None else self.cfg['min_image_size']
 
-        for attempt in range(1, 4):
-            try:
-                ok, err = await download_image(
+        def _count():
+            nonlocal attempts
+            attempts += 1
+            self.attempts += 1
+
+        async def _attempt():
+            # the slot is taken per attempt, so backoff sleeps between
+            # retries never hold it
+            async with self._download_slot():
+                return await download_image(
                     self.session, url, tmp_path,
-                    self.cfg['min_image_size'], self.cfg['timeout'],
-                    self.loop
+                    min_size, self.cfg['timeout'],
+                    self.loop, self.cfg['max_image_bytes'],
+                    check_type=needs_sniff(url)
                 )
-            except Exception as e:
-                ok, err = False, str(e)
+
+        try:
+            ok, err, h, size = await get_policy().call(url, _attempt, on_attempt=_count)
+        except Exception as e:
+            ok, err = False, str(e) or type(e).__name__
+            logging.warning(f"[Row {self.idx}] download failed after {attempts} attempt(s): {err}")
+
+        if self.archive is not None:
             if ok:
-                break
-            self.failures += 1
-            logging.warning(f"[Row {self.idx}] download attempt {attempt} failed: {err}")
-            await asyncio.sleep(0.5 * attempt)
+                with span('archive'):
+                    await self.loop.run_in_executor(None, self.archive.store, h, tmp_path)
+                if not big_enough(size, self.cfg['min_image_size']):
+                    ok, err = False, 'too_small'
+            self._archive_record(url, ext, h, size, 'ok' if ok else err)
+
+        if self.index is not None:
+            outcome = outcome_of(ok, err)
+            if outcome:
+                await self.loop.run_in_executor(None, self.index.record_url, url, outcome, h, size)
 
         if ok:
-            # dedupe via MD5
-            with open(tmp_path, 'rb') as f:
-                h = hashlib.md5(f.read()).hexdigest()
+            # dedupe via the MD5 computed while streaming
             if h in self.dedup_hashes:
                 os.remove(tmp_path)
-                self.log_rows.append({
-                    'row': self.idx,
-                    'activity_id': self.activity_id,
-                    'url': url,
-                    'file': '',
-                    'status': 'download_failed',
-                    'error': 'duplicate_image'
-                })
-            else:
-                self.dedup_hashes.add(h)
+                self._log(url, '', 'download_failed', 'duplicate_image', attempts)
+                return
+            self.dedup_hashes.add(h)
+            # the dHash joins the trees only once the image is kept
+            ph = await self._phash(tmp_path)
+            if self._near_duplicate(ph):
+                os.remove(tmp_path)
+                self._log(url, '', 'download_failed', 'near_duplicate', attempts)
+                return
+            known = await self._lookup_hash(h)
+            if not known:
+                processed = await self._postprocess(url, tmp_path, ext, size, attempts)
+                if processed is None:
+                    return
+                tmp_path, ext, size = processed
+            async with self.store_lock:
+                if known:
+                    # re-read: an earlier store may have rewritten that file
+                    known = await self._lookup_hash(h)
+                    if known:
+                        # the stored copy was post-processed already: reuse
+                        # it, with its extension, instead of the raw download
+                        os.remove(tmp_path)
+                        tmp_path, ext = None, os.path.splitext(known)[1]
+                    else:
+                        # gone meanwhile: store the download, processed
+                        processed = await self._postprocess(url, tmp_path, ext, size, attempts)
+                        if processed is None:
+                            return
+                        tmp_path, ext, size = processed
+                if self._near_duplicate(ph):
+                    # a close copy was kept while this one was processed
+                    if tmp_path:
+                        os.remove(tmp_path)
+                    self._log(url, '', 'download_failed', 'near_duplicate', attempts)
+                    return
+                self._keep_near(ph)
                 async with self.filename_lock:
                     self.success += 1
                     n = self.success
+                self._kept(url)
                 final = f"{self.activity_id}_{self.type}_{n}{ext}"
-                os.replace(tmp_path, os.path.join(self.cfg['output_dir'], final))
-                self.log_rows.append({
-                    'row': self.idx,
-                    'activity_id': self.activity_id,
-                    'url': url,
-                    'file': final,
-                    'status': 'success',
-                    'error': ''
-                })
+                dest  = os.path.join(self.cfg['output_dir'], final)
+                with span('store'):
+                    await self._store(h, size, known, tmp_path, dest)
+            # same content already stored by another row/run
+            self._log(url, final, 'reused' if known else 'success', '', attempts)
         else:
             try: os.remove(tmp_path)
             except: pass
             self.failures += 1
-            self.log_rows.append({
-                'row': self.idx,
-                'activity_id': self.activity_id,
-                'url': url,
-                'file': '',
-                'status': 'download_failed',
-                'error': err
-            })
-
-        # schedule next if quota not met
-        if self.success < self.cfg['max_images_per_site']:
-            nxt = await self._get_next_url()
-            if nxt:
-                return asyncio.create_task(self._worker_with_sem(nxt))
+            self._log(url, '', 'download_failed', err, attempts)
 
-        return None
+    async def _postprocess(self, url, tmp_path, ext, size, attempts):
+        """
+        Verifies / downscales / re-encodes the download in the process pool
+        when the stage is on; (path, ext, size), or None once the image
+        was rejected and logged.
+        """
+        if not postprocess_enabled():
+            return tmp_path, ext, size
+        with span('postprocess'):
+            pok, perr, tmp_path, psize = await run_postprocess(tmp_path)
+        if not pok:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            self.failures += 1
+            self._log(url, '', 'download_failed', perr, attempts)
+            return None
+        return tmp_path, os.path.splitext(tmp_path)[1], psize
+
+    async def _from_index(self, url):
+        """
+        Serves `url` from the image index if its last outcome is known:
+        rejections are replayed and known content is linked, with no
+        network request either way. Returns False to fall through.
+        """
+        rec = await self.loop.run_in_executor(None, self.index.lookup_url, url)
+        if not rec:
+            return False
+        ext = os.path.splitext(url)[1].split('?')[0] or '.jpg'
+        outcome = rec['outcome']
+        if outcome not in PERMANENT:
+            # remembered by an older version; no longer trusted
+            return False
+        if outcome in ('ok', 'too_small') and rec['size']:
+            # judged again under the current min_image_size
+            outcome = 'ok' if big_enough(rec['size'], self.cfg['min_image_size']) else 'too_small'
+        elif outcome == 'too_small':
+            return False
+        if outcome != 'ok':
+            self.failures += 1
+            if self.archive is not None:
+                # the index keeps the hash of archived rejections
+                self._archive_record(url, ext, rec['hash'], rec['size'], outcome)
+            self._log(url, '', 'download_failed', f"{outcome} (cached)")
+            return True
+        if rec['outcome'] != 'ok':
+            # rejected before, big enough now: fetch it
+            return False
+        # held from the lookup to the link, so no store of this row can
+        # rewrite the stored file in between
+        async with self.store_lock:
+            return await self._reuse(url, ext, rec)
+
+    async def _reuse(self, url, ext, rec):
+        known = await self._lookup_hash(rec['hash'])
+        if not known:
+            return False
+        if self.archive is not None:
+            await self.loop.run_in_executor(None, self.archive.store, rec['hash'], known)
+            self._archive_record(url, ext, rec['hash'], rec['size'], 'ok')
+        if rec['hash'] in self.dedup_hashes:
+            self._log(url, '', 'download_failed', 'duplicate_image')
+            return True
+        self.dedup_hashes.add(rec['hash'])
+        ph = await self._phash(known)
+        if self._near_duplicate(ph):
+            self._log(url, '', 'download_failed', 'near_duplicate')
+            return True
+        self._keep_near(ph)
+        async with self.filename_lock:
+            self.success += 1
+            n = self.success
+        self._kept(url)
+        final = f"{self.activity_id}_{self.type}_{n}{os.path.splitext(known)[1]}"
+        dest  = os.path.join(self.cfg['output_dir'], final)
+        with span('store'):
+            await self._store(rec['hash'], rec['size'], known, None, dest)
+        self._log(url, final, 'reused', '')
+        return True
+
+    async def _lookup_hash(self, h):
+        # SQLite plus an exists() check on output_dir, which may be a
+        # network drive: kept off the event loop
+        if self.index is None:
+            return None
+        return await self.loop.run_in_executor(None, self.index.lookup_hash, h)
+
+    async def _store(self, h, size, known, tmp_path, dest):
+        """
+        Puts the kept image at `dest`: a hard link to `known` (the same
+        content stored, and post-processed, earlier) where the filesystem
+        allows, else a copy of it; with nothing known, the fresh download at
+        `tmp_path`. Whatever the index recorded at `dest` is dropped before
+        the file is replaced, and `dest` is recorded once it holds `h`.
+        """
+        if known == dest:
+            return
+        index = self.index
+        mover = get_mover()
+        if index is not None:
+            await self.loop.run_in_executor(None, index.forget_path, dest, h)
+        record = (lambda: index.record_blob(h, dest, size)) if index is not None else None
+        if known:
+            if not await self.loop.run_in_executor(None, _try_link, known, dest):
+                await self.loop.run_in_executor(None, shutil.copyfile, known, dest)
+        elif mover is not None:
+            # recorded by the mover once the file is in place
+            await mover.submit(tmp_path, dest, record)
+            return
+        else:
+            os.replace(tmp_path, dest)
+        if record:
+            await self.loop.run_in_executor(None, record)
+
+    async def _phash(self, path):
+        """dHash of `path`, or None when near-dup detection is off or it fails."""
+        if self.cfg['phash_threshold'] is None:
+            return None
+        try:
+            with span('phash'):
+                return await self.loop.run_in_executor(None, dhash, path)
+        except Exception as e:
+            logging.warning(f"[Row {self.idx}] dhash failed: {e}")
+            return None
+
+    def _near_duplicate(self, ph):
+        """
+        True if `ph` is within phash_threshold bits of an image already
+        kept by this row, or by any row when a shared tree is set.
+        """
+        if ph is None:
+            return False
+        radius = self.cfg['phash_threshold']
+        return any(tree is not None and tree.find(ph, radius) is not None
+                   for tree in (self.near_hashes, self.shared_near))
+
+    def _keep_near(self, ph):
+        """Adds a kept image's dHash to the trees later images are checked against."""
+        if ph is None:
+            return
+        self.near_hashes.add(ph)
+        if self.shared_near is not None:
+            self.shared_near.add(ph)
+
+    def _found(self, urls, stage):
+        for u in urls:
+            if u not in self.found:
+                self.found[u] = (stage, len(self.found))
+
+    def _kept(self, url):
+        stage = self.found.get(url, ('static',))[0]
+        self.kept[stage] = self.kept.get(stage, 0) + 1
+
+    def _archive_record(self, url, ext, h, size, outcome):
+        stage, seq = self.found.get(url, ('static', len(self.found)))
+        self.archive.record(self.idx, self.activity_id, self.type, seq, url, ext,
+                            stage, h, size, outcome)
+
+    def _log(self, url, file, status, error, attempts=0):
+        count(f'image_{status}')
+        self.log_rows.append({
+            'row': self.idx,
+            'activity_id': self.activity_id,
+            'url': url,
+            'file': file,
+            'status': status,
+            'error': error,
+            'attempts': attempts
+        })
+
+def _try_link(known, dest):
+    """Hard-links the stored copy to `dest`; False if the filesystem won't."""
+    try:
+        if os.path.exists(dest):
+            os.remove(dest)
+        os.link(known, dest)
+    except OSError:
+        return False
+    return True
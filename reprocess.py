@@ -0,0 +1,173 @@
+# image_scraper/reprocess.py
+"""
+Re-runs selection, dedup and naming over the candidate archive with the
+current config (min_image_size, max_images_per_site, phash_threshold,
+phash_cross_row), without any network access:
+
+    python reprocess.py [--start N] [--stop M] [--out DIR] [--log PATH]
+
+Candidates are replayed per row in the order they were discovered. Only
+candidates the live run actually fetched are available: images rejected
+below archive_min_size, or never reached because the row hit its quota,
+are not in the archive.
+
+Kept images get the same postprocessing as a live run (when
+postprocess_workers is set), and rewriting the live output_dir keeps the
+image index in step, so later runs never reuse a file that was replaced.
+"""
+import io
+import os
+import re
+import uuid
+import argparse
+from config_manager import load_config
+from candidate_archive import CandidateArchive
+from downloader import big_enough
+from image_index import ImageIndex
+from log_sink import LogSink
+from phash import dhash, BKTree
+from postprocess import postprocess
+
+# <id>_<type>_<n>.<ext>; group 1 is the row's '<id>_<type>' prefix
+_NAME = re.compile(r'(.+)_\d+\.\w+$')
+
+def list_outputs(out_dir):
+    """Output files by '<id>_<type>_' prefix, from a single directory listing."""
+    by_prefix = {}
+    for fn in os.listdir(out_dir):
+        m = _NAME.match(fn)
+        if m and not fn.startswith('tmp_'):
+            by_prefix.setdefault(m.group(1) + '_', []).append(fn)
+    return by_prefix
+
+def _clear_row(out_dir, names, index):
+    """Removes the row's previously named files and their index entries."""
+    for fn in names:
+        path = os.path.join(out_dir, fn)
+        if index is not None:
+            index.forget_path(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _write(path, data):
+    part = path + '.part'
+    with open(part, 'wb') as f:
+        f.write(data)
+    os.replace(part, path)
+
+def reprocess_row(archive, row, cfg, out_dir, log, shared_near=None, outputs=None,
+                  index=None):
+    """
+    Rebuilds one row's output files from its archived candidates. `outputs`
+    is list_outputs(out_dir), kept up to date here; `index` is the live
+    image index, so reuse in later runs sees the rewritten files.
+    """
+    cands = archive.candidates(row)
+    if not cands:
+        return 0, 0
+    activity_id, type_ = cands[0]['activity_id'], cands[0]['type']
+    prefix = f'{activity_id}_{type_}_'
+    if outputs is None:
+        outputs = list_outputs(out_dir)
+    _clear_row(out_dir, outputs.pop(prefix, []), index)
+    written = outputs[prefix] = []
+    radius  = cfg['phash_threshold']
+    pp_opts = ((cfg['postprocess_max_dim'], cfg['postprocess_format'], cfg['postprocess_quality'])
+               if cfg['postprocess_workers'] else None)
+    hashes  = set()
+    near    = BKTree()
+    kept = failed = 0
+
+    def _log(c, file, status, error):
+        log.append({'row': row, 'activity_id': activity_id, 'url': c['url'],
+                    'file': file, 'status': status, 'error': error, 'attempts': 0})
+
+    for c in cands:
+        if kept >= cfg['max_images_per_site']:
+            break
+        data = archive.read(c['hash']) if c['hash'] else None
+        if data is None:
+            failed += 1
+            _log(c, '', 'download_failed', f"{c['outcome']} (archived)")
+            continue
+        if c['width'] and not big_enough((c['width'], c['height']), cfg['min_image_size']):
+            failed += 1
+            _log(c, '', 'download_failed', 'too_small')
+            continue
+        if c['hash'] in hashes:
+            _log(c, '', 'download_failed', 'duplicate_image')
+            continue
+        hashes.add(c['hash'])
+        if radius is not None:
+            try:
+                ph = dhash(io.BytesIO(data))
+            except Exception:
+                ph = None
+            if ph is not None:
+                if any(t is not None and t.find(ph, radius) is not None
+                       for t in (near, shared_near)):
+                    _log(c, '', 'download_failed', 'near_duplicate')
+                    continue
+                near.add(ph)
+                if shared_near is not None:
+                    shared_near.add(ph)
+        tmp  = os.path.join(out_dir, f"tmp_{uuid.uuid4().hex}{c['ext']}")
+        _write(tmp, data)
+        ext, size = c['ext'], (c['width'], c['height']) if c['width'] else None
+        if pp_opts is not None:
+            # the same verify / downscale / re-encode as a live run
+            ok, err, tmp, psize = postprocess(tmp, *pp_opts)
+            if not ok:
+                try: os.remove(tmp)
+                except OSError: pass
+                failed += 1
+                _log(c, '', 'download_failed', err)
+                continue
+            ext, size = os.path.splitext(tmp)[1], psize
+        kept += 1
+        final = f"{prefix}{kept}{ext}"
+        dest  = os.path.join(out_dir, final)
+        if index is not None:
+            index.forget_path(dest, c['hash'])
+        os.replace(tmp, dest)
+        if index is not None:
+            index.record_blob(c['hash'], dest, size)
+        written.append(final)
+        _log(c, final, 'success', '')
+    return kept, failed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--start', type=int, default=0)
+    ap.add_argument('--stop', type=int)
+    ap.add_argument('--out', help='output directory (default: output_dir)')
+    ap.add_argument('--log', help='JSONL log (default: reprocess_log.jsonl in archive_dir)')
+    args = ap.parse_args()
+
+    cfg = load_config()
+    if not cfg['archive_dir']:
+        raise SystemExit('archive_dir is not set; nothing to reprocess')
+    archive = CandidateArchive(cfg['archive_dir'], cfg['archive_pack_bytes'])
+    out_dir = args.out or cfg['output_dir']
+    os.makedirs(out_dir, exist_ok=True)
+    log = LogSink(args.log or os.path.join(cfg['archive_dir'], 'reprocess_log.jsonl'),
+                  cfg['log_flush_every'])
+    shared_near = BKTree() if cfg['phash_cross_row'] else None
+    # only the live output folder is known to the index
+    index   = ImageIndex(cfg['image_index_db']) if out_dir == cfg['output_dir'] else None
+    outputs = list_outputs(out_dir)
+    try:
+        for row in archive.rows(args.start, args.stop):
+            kept, failed = reprocess_row(archive, row, cfg, out_dir, log, shared_near,
+                                         outputs, index)
+            print(f"Row {row}: {kept} kept, {failed} rejected")
+    finally:
+        log.close()
+        archive.close()
+        if index is not None:
+            index.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# image_scraper/retry.py
+
+import time
+import random
+import asyncio
+import logging
+from urllib.parse import urlsplit
+import aiohttp
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+
+TRANSIENT_STATUS = {408, 425, 429}
+
+class CircuitOpen(Exception):
+    """Raised without a request while a host's breaker is open."""
+
+def is_transient(e):
+    """Worth retrying: timeouts, connection drops, 5xx, 408/425/429."""
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status in TRANSIENT_STATUS or e.status >= 500
+    return isinstance(e, (
+        asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError
+    ))
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After value (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, when.timestamp() - time.time())
+
+def _retry_after(e):
+    headers = getattr(e, 'headers', None) or {}
+    return parse_retry_after(headers.get('Retry-After'))
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures on a host. Once
+    `cooldown` seconds have passed, a single trial request is let through;
+    its outcome closes or re-opens the breaker. A trial that ends without
+    a verdict (cancelled, or a local error) is released, and one that
+    hangs for another cooldown no longer blocks the next trial.
+    """
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown  = cooldown
+        self.failures  = 0
+        self.opened_at = None
+        self.trial     = False
+        self.trial_at  = 0.0
+
+    def allow(self):
+        """True if a request may go out; sets `trial` when it is the probe."""
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if self.trial and now - self.trial_at < self.cooldown:
+            return False
+        if now - self.opened_at >= self.cooldown:
+            self.trial    = True
+            self.trial_at = now
+            return True
+        return False
+
+    def release(self):
+        """The trial ended without a verdict: wait another cooldown, then probe again."""
+        if self.trial:
+            self.trial     = False
+            self.opened_at = time.monotonic()
+
+    def success(self):
+        self.failures  = 0
+        self.opened_at = None
+        self.trial     = False
+
+    def failure(self):
+        self.failures += 1
+        if self.trial or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self.trial     = False
+
+class RetryPolicy:
+    """
+    One policy for page/CSS fetches, image downloads and HEAD probes:
+    permanent errors fail at once, transient ones are retried with
+    exponential backoff and full jitter (Retry-After wins when longer),
+    and each host has a circuit breaker.
+    """
+    def __init__(self, attempts=3, backoff_base=0.5, backoff_max=10.0,
+                 retry_after_max=30.0, breaker_threshold=5, breaker_cooldown=60.0):
+        self.attempts          = attempts
+        self.backoff_base      = backoff_base
+        self.backoff_max       = backoff_max
+        self.retry_after_max   = retry_after_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown  = breaker_cooldown
+        self.breakers          = {}
+
+    def breaker(self, host):
+        b = self.breakers.get(host)
+        if b is None:
+            b = self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return b
+
+    def delay(self, attempt, e):
+        """Seconds before the next attempt, or None to give up now."""
+        d = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        ra = _retry_after(e)
+        if ra is not None:
+            if ra > self.retry_after_max:
+                return None
+            d = max(d, ra)
+        return d
+
+    async def call(self, url, op, attempts=None, on_attempt=None):
+        """
+        Awaits `op()` until it returns, a permanent error is raised, or the
+        attempts run out (the last error is re-raised). `on_attempt` is
+        called before every try, for counting.
+        """
+        host = urlsplit(url).hostname or ''
+        br = self.breaker(host)
+        attempts = attempts or self.attempts
+        for attempt in range(1, attempts + 1):
+            if not br.allow():
+                raise CircuitOpen(f'circuit_open:{host}')
+            trial = br.trial
+            verdict = False
+            if on_attempt:
+                on_attempt()
+            try:
+                result = await op()
+            except Exception as e:
+                if not is_transient(e):
+                    # the host answered (404, 403, ...): it's up
+                    if isinstance(e, aiohttp.ClientResponseError):
+                        br.success()
+                        verdict = True
+                    raise
+                br.failure()
+                verdict = True
+                d = self.delay(attempt, e) if attempt < attempts else None
+                if d is None:
+                    raise
+                logging.info(f"[retry] {url} attempt {attempt} failed ({e}); retrying in {d:.1f}s")
+                await asyncio.sleep(d)
+            else:
+                br.success()
+                verdict = True
+                return result
+            finally:
+                # cancelled, or failed locally (disk, decode): says nothing
+                # about the host, so the trial must not stay claimed
+                if trial and not verdict:
+                    br.release()
+
+_policy = RetryPolicy()
+
+def configure_retry(cfg):
+    global _policy
+    _policy = RetryPolicy(
+        attempts=cfg['retry_attempts'],
+        backoff_base=cfg['retry_backoff_base'],
+        backoff_max=cfg['retry_backoff_max'],
+        retry_after_max=cfg['retry_after_max'],
+        breaker_threshold=cfg['breaker_threshold'],
+        breaker_cooldown=cfg['breaker_cooldown'],
+    )
+    return _policy
+
+def get_policy():
+    return _policy
@@ -1,21 +1,34 @@
 # run.py
 
+import socket
 import asyncio
-import pandas as pd
-import json
-import aiohttp
+import logging
+import argparse
 import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
 from config_manager import load_config
 from logger import setup_logging
-from processor import process_row
+from scheduler import run_rows
+from run_state import RunState
+from work_queue import WorkQueue
+from input_reader import read_rows, count_rows
+from image_index import ImageIndex
+from candidate_archive import CandidateArchive
+from strategy_cache import StrategyCache
+from dynamic_fetcher import configure_pool, shutdown_pool
+from fetcher import configure_cache, shutdown_cache
+from parser import configure_parse_pool, shutdown_parse_pool
+from network import NetworkLayer
+from retry import configure_retry
+from postprocess import configure_postprocess, shutdown_postprocess
+from metrics import configure_metrics, shutdown_metrics
+from write_behind import configure_mover, shutdown_mover
+from log_sink import LogSink, import_excel_log, export_reports, part_path, merge_part
 
-async def main():
-    cfg = load_config()
-
-    # Auto-tune per-instance CPU slice
+def _setup(cfg, processes=1):
+    # Auto-tune this process's CPU slice
     total_cpus = multiprocessing.cpu_count()
-    per_bot = max(1, total_cpus // cfg.get('instances', 1))
+    per_bot = max(1, total_cpus // processes)
     cfg['executor_workers'] = per_bot
     cfg['download_concurrency'] = per_bot
 
@@ -24,23 +37,191 @@ async def main():
     loop = asyncio.get_event_loop()
     loop.set_default_executor(executor)
 
-    df = pd.read_excel(cfg['input_excel'])
-    start = cfg['last_processed_row']
-    summary = []
-    async with aiohttp.ClientSession() as session:
-        for idx, row in df.iloc[start:].iterrows():
-            await process_row(
-                session,
-                idx,
-                row['Type'],
-                row['ActivityId'],
-                row['Website'],
-                summary,
-                cfg
-            )
-
-    with open(cfg['summary_json'], 'w') as f:
-        json.dump(summary, f, indent=2)
+    configure_retry(cfg)
+    configure_pool(cfg['selenium_pool_size'], cfg['selenium_max_pages'])
+    configure_cache(cfg['http_cache_dir'], cfg['http_cache_max_bytes'])
+    configure_parse_pool(cfg['parse_process_workers'], cfg['parse_process_threshold'])
+    configure_postprocess(cfg)
+    configure_mover(cfg)
+
+def _teardown():
+    # drain the write-behind queue first: its moves are still being timed
+    shutdown_mover()
+    shutdown_metrics()
+    shutdown_pool()
+    shutdown_cache()
+    shutdown_parse_pool()
+    shutdown_postprocess()
+
+def _archive(cfg):
+    if cfg['archive_dir']:
+        return CandidateArchive(cfg['archive_dir'], cfg['archive_pack_bytes'])
+    return None
+
+def _strategy(cfg):
+    if cfg['strategy_db']:
+        return StrategyCache(cfg['strategy_db'], cfg['strategy_min_rows'])
+    return None
+
+def _rows(path, lo, hi, done):
+    return (r for r in read_rows(path, lo, hi) if r[0] not in done)
+
+async def main():
+    cfg = load_config()
+    _setup(cfg)
+    configure_metrics(cfg)
+
+    state = RunState(cfg['state_db'])
+    start = state.resume_from(cfg['start_row'])
+    done  = state.done_rows(start)
+    index = ImageIndex(cfg['image_index_db'])
+    archive = _archive(cfg)
+    strategy = _strategy(cfg)
+    import_excel_log(cfg['log_excel'], cfg['log_stream'])
+    log     = LogSink(cfg['log_stream'], cfg['log_flush_every'])
+    summary = LogSink(cfg['summary_stream'], cfg['log_flush_every'])
+    net     = NetworkLayer(cfg)
+    try:
+        async with net.session() as session:
+            rows = _rows(cfg['input_excel'], start, None, done)
+            await run_rows(session, rows, log, summary, state, cfg,
+                           index=index, archive=archive, strategy=strategy)
+    finally:
+        log.close()
+        summary.close()
+        # pending moves record into the index as they land
+        shutdown_mover()
+        state.close()
+        index.close()
+        if archive is not None:
+            archive.close()
+        if strategy is not None:
+            strategy.close()
+        _teardown()
+        net.write_stats(cfg['host_stats_json'])
+
+    # one-pass Excel / JSON reports from the streams
+    export_reports(cfg)
+
+async def _heartbeat(queue, worker, lo, lease_seconds):
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        if not queue.heartbeat(worker, lo, lease_seconds):
+            # rows are checkpointed in state_db, so the new owner skips ours
+            logging.warning(f"[{worker}] lease on rows {lo}+ expired and was reassigned")
+            return
+
+async def work(worker):
+    """
+    Worker loop: leases row ranges from `queue_db` until none are left,
+    writing to its own log/summary streams, which are appended to the
+    main streams (under the queue lock) when it exits.
+    """
+    cfg = load_config()
+    _setup(cfg, cfg['instances'])
+    configure_metrics(cfg, worker)
+
+    queue = WorkQueue(cfg['queue_db'])
+    state = RunState(cfg['state_db'])
+    index = ImageIndex(cfg['image_index_db'])
+    archive = _archive(cfg)
+    strategy = _strategy(cfg)
+    log     = LogSink(part_path(cfg['log_stream'], worker), cfg['log_flush_every'])
+    summary = LogSink(part_path(cfg['summary_stream'], worker), cfg['log_flush_every'])
+    net     = NetworkLayer(cfg)
+    try:
+        async with net.session() as session:
+            while True:
+                unit = queue.lease(worker, cfg['lease_seconds'])
+                if unit is None:
+                    if not queue.outstanding():
+                        break
+                    # others hold the rest; wait in case a lease expires
+                    await asyncio.sleep(cfg['lease_seconds'] / 3)
+                    continue
+                lo, hi = unit
+                rows = _rows(cfg['input_excel'], lo, hi, state.done_rows(lo))
+                beat = asyncio.create_task(_heartbeat(queue, worker, lo, cfg['lease_seconds']))
+                try:
+                    await run_rows(session, rows, log, summary, state, cfg,
+                                   index=index, archive=archive, strategy=strategy)
+                finally:
+                    beat.cancel()
+                queue.complete(worker, lo)
+    finally:
+        log.close()
+        summary.close()
+        shutdown_mover()
+        shutdown_metrics()
+        with queue.locked():
+            merge_part(log.path, cfg['log_stream'])
+            merge_part(summary.path, cfg['summary_stream'])
+            if cfg['metrics_stream']:
+                merge_part(part_path(cfg['metrics_stream'], worker), cfg['metrics_stream'])
+        queue.close()
+        state.close()
+        index.close()
+        if archive is not None:
+            archive.close()
+        if strategy is not None:
+            strategy.close()
+        _teardown()
+        net.write_stats(part_path(cfg['host_stats_json'], worker))
+
+def _work(worker):
+    asyncio.run(work(worker))
+
+def coordinate():
+    """
+    Splits the sheet into `shard_size`-row units in `queue_db`, runs
+    `instances` local workers, then exports the merged reports. Further
+    processes on the same machine may join with `python run.py --worker`;
+    the SQLite stores are local-disk only, so workers never span hosts.
+    """
+    cfg = load_config()
+    setup_logging(cfg['log_level'])
+    total = count_rows(cfg['input_excel'])
+    state = RunState(cfg['state_db'])
+    done  = state.done_rows(cfg['start_row'])
+    state.close()
+    queue = WorkQueue(cfg['queue_db'])
+    # finished units with new or failed rows are handed out again
+    queue.seed(cfg['start_row'], total, cfg['shard_size'], done)
+    import_excel_log(cfg['log_excel'], cfg['log_stream'])
+
+    host    = socket.gethostname()
+    workers = [f'{host}-{i}' for i in range(cfg['instances'])]
+    procs   = [multiprocessing.Process(target=_work, args=(w,)) for w in workers]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    # streams left behind by workers that crashed before merging
+    with queue.locked():
+        for w in workers:
+            merge_part(part_path(cfg['log_stream'], w), cfg['log_stream'])
+            merge_part(part_path(cfg['summary_stream'], w), cfg['summary_stream'])
+            if cfg['metrics_stream']:
+                merge_part(part_path(cfg['metrics_stream'], w), cfg['metrics_stream'])
+    left = queue.outstanding()
+    queue.close()
+    if left:
+        logging.warning(f"{left} row ranges still outstanding (other workers or crashes)")
+
+    export_reports(cfg)
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    ap = argparse.ArgumentParser()
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument('--coordinate', action='store_true',
+                      help='seed the work queue and run `instances` worker processes')
+    mode.add_argument('--worker', action='store_true',
+                      help='join an existing work queue from another process on this machine')
+    args = ap.parse_args()
+    if args.coordinate:
+        coordinate()
+    elif args.worker:
+        _work(f'{socket.gethostname()}-{multiprocessing.current_process().pid}')
+    else:
+        asyncio.run(main())
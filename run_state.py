@@ -0,0 +1,91 @@
+# image_scraper/run_state.py
+
+import os
+import time
+import sqlite3
+
+class RunState:
+    """
+    Durable per-row run state in SQLite (WAL, synchronous=FULL). Each
+    status change is its own transaction, so a crash never loses a
+    finished row or leaves a half-written record.
+    """
+    def __init__(self, path):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=FULL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS rows (
+                idx         INTEGER PRIMARY KEY,
+                activity_id TEXT,
+                status      TEXT NOT NULL,
+                started     REAL,
+                finished    REAL,
+                duration    REAL,
+                successes   INTEGER DEFAULT 0,
+                failures    INTEGER DEFAULT 0,
+                error       TEXT DEFAULT ''
+            )
+        """)
+
+    def start(self, idx, activity_id):
+        self.db.execute(
+            "INSERT OR REPLACE INTO rows (idx, activity_id, status, started) "
+            "VALUES (?, ?, 'running', ?)",
+            (idx, str(activity_id), time.time())
+        )
+
+    def finish(self, idx, successes, failures):
+        now = time.time()
+        self.db.execute(
+            "UPDATE rows SET status='done', finished=?, duration=?-started, "
+            "successes=?, failures=?, error='' WHERE idx=?",
+            (now, now, successes, failures, idx)
+        )
+
+    def finish_many(self, rows):
+        """finish() for each (idx, successes, failures), in one transaction."""
+        now = time.time()
+        self.db.execute('BEGIN')
+        try:
+            self.db.executemany(
+                "UPDATE rows SET status='done', finished=?, duration=?-started, "
+                "successes=?, failures=?, error='' WHERE idx=?",
+                ((now, now, s, f, idx) for idx, s, f in rows)
+            )
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def fail(self, idx, error):
+        now = time.time()
+        self.db.execute(
+            "UPDATE rows SET status='failed', finished=?, duration=?-started, "
+            "error=? WHERE idx=?",
+            (now, now, error, idx)
+        )
+
+    def done_rows(self, start=0):
+        cur = self.db.execute(
+            "SELECT idx FROM rows WHERE status='done' AND idx>=?", (start,)
+        )
+        return {r[0] for r in cur}
+
+    def resume_from(self, start=0):
+        """First row at or after `start` that hasn't finished."""
+        nxt = start
+        for (idx,) in self.db.execute(
+            "SELECT idx FROM rows WHERE status='done' AND idx>=? ORDER BY idx",
+            (start,)
+        ):
+            if idx != nxt:
+                break
+            nxt += 1
+        return nxt
+
+    def close(self):
+        self.db.close()
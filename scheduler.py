@@ -0,0 +1,103 @@
+# image_scraper/scheduler.py
+
+import asyncio
+import logging
+from processor import process_row
+from phash import BKTree
+
+class _Checkpoint:
+    """
+    Group commit of finished rows: their log / summary entries are written
+    and fsynced together, off the event loop, every `rows` rows or
+    `seconds` after the first one waiting, and only then are the rows
+    marked done in `state`. A crash never loses the entries of a done row,
+    and the (possibly synced) log drive sees one fsync per batch.
+    """
+    def __init__(self, log, summary, state, rows, seconds):
+        self.log     = log
+        self.summary = summary
+        self.state   = state
+        self.rows    = max(1, rows)
+        self.seconds = seconds
+        self.pending = []
+        self.timer   = None
+        self.lock    = asyncio.Lock()
+
+    async def add(self, idx, successes, failures):
+        self.pending.append((idx, successes, failures))
+        if len(self.pending) >= self.rows:
+            await self.commit()
+        elif self.timer is None:
+            self.timer = asyncio.create_task(self._after())
+
+    async def _after(self):
+        await asyncio.sleep(self.seconds)
+        self.timer = None
+        await self.commit()
+
+    def _sync(self):
+        self.log.flush(sync=True)
+        self.summary.flush(sync=True)
+
+    async def commit(self):
+        async with self.lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            # every entry of the batch was appended before it was taken
+            await asyncio.get_running_loop().run_in_executor(None, self._sync)
+            self.state.finish_many(batch)
+
+    async def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        await self.commit()
+
+async def run_rows(session, rows, log, summary, state, cfg, index=None, archive=None,
+                   strategy=None):
+    """
+    Keeps up to cfg['row_concurrency'] rows in flight on the shared session.
+    `rows` yields (idx, type_, activity_id, website) in sheet order; each
+    row is recorded in `state` as it starts, and marked done, whatever
+    order rows complete in, by the group commit of its log entries.
+    """
+    row_sem      = asyncio.Semaphore(cfg['row_concurrency'])
+    download_sem = asyncio.Semaphore(cfg['global_download_concurrency'])
+    shared_near  = BKTree() if cfg['phash_cross_row'] else None
+    checkpoint   = _Checkpoint(log, summary, state,
+                               cfg['checkpoint_rows'], cfg['checkpoint_seconds'])
+    tasks        = set()
+
+    async def _one(idx, type_, activity_id, website):
+        try:
+            rp = await process_row(
+                session, idx, type_, activity_id, website,
+                log, summary, cfg,
+                download_sem=download_sem, index=index,
+                shared_near=shared_near, archive=archive,
+                strategy=strategy
+            )
+        except Exception as e:
+            # recorded as failed (not done), so a resume retries it
+            logging.exception(f"[Row {idx}] processing failed")
+            state.fail(idx, str(e))
+            return
+        finally:
+            row_sem.release()
+        # done once its log / summary entries are on disk, with the rest of
+        # its batch
+        await checkpoint.add(idx, rp.success, rp.failures)
+
+    for idx, type_, activity_id, website in rows:
+        await row_sem.acquire()
+        state.start(idx, activity_id)
+        task = asyncio.create_task(_one(idx, type_, activity_id, website))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    try:
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await checkpoint.close()
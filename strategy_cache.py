@@ -0,0 +1,91 @@
+# image_scraper/strategy_cache.py
+
+import os
+import time
+import random
+import sqlite3
+from urllib.parse import urlsplit
+
+STAGES = ('static', 'css', 'crawl', 'selenium')
+# share of rows that ignore the learned plan, so a skipped stage can prove
+# itself again (its counters don't move while it is skipped)
+EXPLORE = 0.1
+
+def domain_of(url):
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+class StrategyCache:
+    """
+    Per-domain record of which discovery stage produced kept images: for
+    each of static / css / crawl / selenium, the rows where the stage
+    actually ran and how many of its images were kept. After `min_rows`
+    runs, a stage that never kept anything is skipped on that domain.
+    """
+    def __init__(self, path, min_rows=3):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.min_rows = min_rows
+        self.db = sqlite3.connect(path, isolation_level=None, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS domains (
+                domain        TEXT PRIMARY KEY,
+                static_runs   INTEGER DEFAULT 0,
+                static_kept   INTEGER DEFAULT 0,
+                css_runs      INTEGER DEFAULT 0,
+                css_kept      INTEGER DEFAULT 0,
+                crawl_runs    INTEGER DEFAULT 0,
+                crawl_kept    INTEGER DEFAULT 0,
+                selenium_runs INTEGER DEFAULT 0,
+                selenium_kept INTEGER DEFAULT 0,
+                updated       REAL
+            ) WITHOUT ROWID
+        """)
+        # stores from before a stage existed
+        have = {r[1] for r in self.db.execute("PRAGMA table_info(domains)")}
+        for s in STAGES:
+            for col in (f'{s}_runs', f'{s}_kept'):
+                if col not in have:
+                    self.db.execute(f"ALTER TABLE domains ADD COLUMN {col} INTEGER DEFAULT 0")
+
+    def lookup(self, domain):
+        r = self.db.execute(
+            "SELECT " + ', '.join(f'{s}_runs, {s}_kept' for s in STAGES)
+            + " FROM domains WHERE domain=?", (domain,)
+        ).fetchone()
+        if not r:
+            return None
+        return {s: {'runs': r[2 * i], 'kept': r[2 * i + 1]} for i, s in enumerate(STAGES)}
+
+    def plan(self, domain):
+        """
+        Stages to skip or start early for `domain`:
+          skip_static / skip_css / skip_crawl / skip_selenium: ran min_rows times, kept nothing
+          selenium_useful: Selenium has produced kept images here before
+        """
+        rec = self.lookup(domain)
+        if rec is None or random.random() < EXPLORE:
+            return {}
+        useless = {s: rec[s]['runs'] >= self.min_rows and rec[s]['kept'] == 0 for s in STAGES}
+        plan = {f'skip_{s}': useless[s] for s in STAGES}
+        plan['selenium_useful'] = rec['selenium']['kept'] > 0
+        if not plan['selenium_useful']:
+            # never skip the static page without a proven alternative
+            plan['skip_static'] = False
+        return plan
+
+    def record(self, domain, ran, kept):
+        """`ran`: stages that ran this row; `kept`: stage -> images kept."""
+        self.db.execute("INSERT OR IGNORE INTO domains (domain) VALUES (?)", (domain,))
+        self.db.execute(
+            "UPDATE domains SET "
+            + ', '.join(f'{s}_runs={s}_runs+?, {s}_kept={s}_kept+?' for s in STAGES)
+            + ", updated=? WHERE domain=?",
+            (*[v for s in STAGES for v in (int(s in ran), kept.get(s, 0))], time.time(), domain)
+        )
+
+    def close(self):
+        self.db.close()
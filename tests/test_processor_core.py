@@ -0,0 +1,93 @@
+# tests/test_processor_core.py
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import processor_core
+from processor_core import RowProcessor
+
+CFG = {
+    'download_concurrency': 2, 'max_images_per_site': 50, 'crawl_max_pages': 5,
+    'speculative_dynamic': False, 'request_retries': 1, 'timeout': 5,
+    'min_image_size': [1, 1],
+}
+STATIC = [f'http://site.test/s{i}.jpg' for i in range(6)]
+CRAWLED = [f'http://site.test/c{i}.jpg' for i in range(3)]
+
+class _Plan:
+    def plan(self, domain):
+        return {'skip_selenium': True, 'skip_css': True}
+
+    def record(self, domain, ran, kept):
+        pass
+
+class _Frontier:
+    """Hands its images over while the static downloads are still running."""
+    def __init__(self, session, start_url, cfg, on_images):
+        self.on_images = on_images
+
+    async def run(self, html):
+        await asyncio.sleep(0.01)
+        self.on_images(CRAWLED)
+
+def test_crawled_urls_are_downloaded_once(monkeypatch):
+    async def fetch(session, url, retries, timeout):
+        return '<html></html>', None
+
+    async def extract(html, base, *args):
+        return list(STATIC), []
+
+    seen = []
+
+    async def worker(self, url):
+        seen.append(url)
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(processor_core, 'fetch', fetch)
+    monkeypatch.setattr(processor_core, 'extract_image_urls', extract)
+    monkeypatch.setattr(processor_core, 'CrawlFrontier', _Frontier)
+    monkeypatch.setattr(RowProcessor, '_worker', worker)
+
+    async def scenario():
+        rp = RowProcessor(None, 1, 'T', 'A', 'http://site.test/', CFG, [], strategy=_Plan())
+        await rp.run()
+
+    asyncio.run(scenario())
+    assert sorted(seen) == sorted(STATIC + CRAWLED)
+
+def test_rejected_image_does_not_block_its_near_duplicates(tmp_path, monkeypatch):
+    from PIL import Image
+
+    async def download(session, url, path, *args, **kwargs):
+        # same picture, different bytes: a near duplicate, not an MD5 one
+        Image.new('RGB', (64, 64), (200, 30, 30)).save(path, 'PNG', compress_level=len(url) % 9)
+        return True, None, url, (64, 64)
+
+    calls = []
+
+    async def postprocess(path):
+        # the first copy fails to re-encode
+        calls.append(path)
+        if len(calls) == 1:
+            return False, 'encode_error', path, None
+        return True, None, path, (64, 64)
+
+    monkeypatch.setattr(processor_core, 'download_image', download)
+    monkeypatch.setattr(processor_core, 'postprocess_enabled', lambda: True)
+    monkeypatch.setattr(processor_core, 'run_postprocess', postprocess)
+    cfg = dict(CFG, phash_threshold=6, output_dir=str(tmp_path), max_image_bytes=None)
+    log = []
+
+    async def scenario():
+        rp = RowProcessor(None, 1, 'T', 'A', 'http://site.test/', cfg, log)
+        await rp._worker('http://site.test/a.png')
+        await rp._worker('http://site.test/copy-of-a.png')
+        return rp
+
+    rp = asyncio.run(scenario())
+    assert [(e['status'], e['error']) for e in log] == [
+        ('download_failed', 'encode_error'), ('success', '')
+    ]
+    assert rp.success == 1
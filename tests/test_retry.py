@@ -0,0 +1,77 @@
+# tests/test_retry.py
+
+import os
+import sys
+import time
+import asyncio
+from email.utils import formatdate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from retry import RetryPolicy, CircuitOpen, parse_retry_after
+
+def _open_breaker(policy, host):
+    """A breaker that opened one cooldown ago, so the next request is the trial."""
+    br = policy.breaker(host)
+    br.failures  = policy.breaker_threshold
+    br.opened_at = time.monotonic() - policy.breaker_cooldown
+    return br
+
+def test_cancelled_trial_releases_the_breaker():
+    policy = RetryPolicy(attempts=1, breaker_threshold=1, breaker_cooldown=0.05)
+    br = _open_breaker(policy, 'h.test')
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.create_task(policy.call('http://h.test/a', hang))
+        await started.wait()
+        assert br.trial
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not br.trial
+
+        # re-armed: blocked for one cooldown, then the next trial goes out
+        with pytest.raises(CircuitOpen):
+            await policy.call('http://h.test/b', lambda: asyncio.sleep(0, 'ok'))
+        await asyncio.sleep(0.06)
+        assert await policy.call('http://h.test/c', lambda: asyncio.sleep(0, 'ok')) == 'ok'
+        assert br.opened_at is None
+
+    asyncio.run(scenario())
+
+def test_local_error_during_trial_releases_the_breaker():
+    policy = RetryPolicy(attempts=1, breaker_threshold=1, breaker_cooldown=0.05)
+    br = _open_breaker(policy, 'h.test')
+
+    async def broken():
+        raise ValueError('decode failed')
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await policy.call('http://h.test/a', broken)
+        assert not br.trial and br.opened_at is not None
+
+    asyncio.run(scenario())
+
+def test_hung_trial_expires_after_a_cooldown():
+    policy = RetryPolicy(attempts=1, breaker_threshold=1, breaker_cooldown=0.05)
+    br = _open_breaker(policy, 'h.test')
+    assert br.allow() and br.trial
+    assert not br.allow()
+    br.trial_at -= 0.06
+    assert br.allow()
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after('-5') == 0.0
+    soon = formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= parse_retry_after(soon) <= 60
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,49 @@
+# tests/test_scheduler.py
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scheduler
+from log_sink import LogSink, read_stream
+from run_state import RunState
+
+CFG = {
+    'row_concurrency': 3, 'global_download_concurrency': 4, 'phash_cross_row': False,
+    'checkpoint_rows': 4, 'checkpoint_seconds': 0.05,
+}
+
+class _Result:
+    success, failures = 1, 0
+
+def test_rows_are_done_only_once_their_log_is_on_disk(tmp_path, monkeypatch):
+    async def process_row(session, idx, type_, activity_id, website, log, summary, cfg, **kw):
+        await asyncio.sleep(0.01 * (idx % 3))
+        log.append({'row': idx})
+        summary.append({'row': idx})
+        return _Result()
+
+    monkeypatch.setattr(scheduler, 'process_row', process_row)
+    log_path = str(tmp_path / 'log.jsonl')
+    log      = LogSink(log_path, flush_every=1000)
+    summary  = LogSink(str(tmp_path / 'summary.jsonl'), flush_every=1000)
+    state    = RunState(str(tmp_path / 'state.sqlite3'))
+    batches  = []
+    finish_many = state.finish_many
+
+    def checked(rows):
+        on_disk = {e['row'] for e in read_stream(log_path)}
+        assert {idx for idx, _, _ in rows} <= on_disk
+        batches.append(len(rows))
+        finish_many(rows)
+
+    state.finish_many = checked
+    rows = [(i, 'T', f'A{i}', f'http://s{i}.test/') for i in range(10)]
+    asyncio.run(scheduler.run_rows(None, iter(rows), log, summary, state, CFG))
+
+    assert state.done_rows() == set(range(10))
+    assert sum(batches) == 10 and len(batches) < 10
+    log.close()
+    summary.close()
+    state.close()
@@ -0,0 +1,38 @@
+# tests/test_work_queue.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from work_queue import WorkQueue
+
+def _drain(queue):
+    """Leases and completes every unit; the (lo, hi) pairs handed out."""
+    units = []
+    while True:
+        unit = queue.lease('w', 60)
+        if unit is None:
+            return units
+        units.append(tuple(unit))
+        queue.complete('w', unit[0])
+
+def test_grown_sheet_reopens_and_extends_the_last_unit(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'))
+    queue.seed(0, 30, 25)
+    assert _drain(queue) == [(0, 25), (25, 30)]
+
+    queue.seed(0, 45, 25, done=set(range(30)))
+    assert queue.outstanding() == 1
+    assert _drain(queue) == [(25, 45)]
+    queue.close()
+
+def test_failed_row_reopens_its_unit(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'))
+    queue.seed(0, 50, 25)
+    _drain(queue)
+
+    queue.seed(0, 50, 25, done=set(range(50)) - {31})
+    assert _drain(queue) == [(25, 50)]
+    queue.seed(0, 50, 25, done=set(range(50)))
+    assert queue.outstanding() == 0
+    queue.close()
@@ -0,0 +1,108 @@
+# image_scraper/work_queue.py
+
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+
+class WorkQueue:
+    """
+    Shared queue of row ranges [lo, hi) in SQLite, leased to workers.
+    A lease lasts `lease_seconds` and is extended by heartbeats; a unit
+    whose lease expires (worker crashed or hung) is handed to the next
+    worker that asks. Every worker process on this machine opens the same
+    database, which must be on a local disk: WAL mode needs shared memory
+    between the processes and breaks on network or synced drives, so the
+    queue (like state_db, image_index_db and strategy_db) is single-host.
+    """
+    def __init__(self, path):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=FULL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                lo          INTEGER PRIMARY KEY,
+                hi          INTEGER NOT NULL,
+                status      TEXT NOT NULL DEFAULT 'pending',
+                owner       TEXT,
+                lease_until REAL,
+                leases      INTEGER DEFAULT 0,
+                finished    REAL
+            )
+        """)
+
+    @contextmanager
+    def locked(self):
+        """Holds the database write lock: a mutex across the worker processes."""
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        else:
+            self.db.execute('COMMIT')
+
+    def seed(self, start, end, size, done=frozenset()):
+        """
+        Adds the units covering rows [start, end) and fits existing ones to
+        `end`. A finished unit holding rows that are not in `done` (rows
+        since appended to the sheet, or rows that failed) is pending again.
+        """
+        units = [(lo, min(lo + size, end)) for lo in range(start, end, size)]
+        with self.locked():
+            self.db.executemany(
+                "INSERT INTO units (lo, hi) VALUES (?, ?) "
+                "ON CONFLICT (lo) DO UPDATE SET hi=excluded.hi",
+                units
+            )
+            reopen = [(lo,) for lo, hi in units
+                      if any(r not in done for r in range(lo, hi))]
+            self.db.executemany(
+                "UPDATE units SET status='pending', owner=NULL, lease_until=NULL, "
+                "finished=NULL WHERE lo=? AND status='done'",
+                reopen
+            )
+
+    def lease(self, owner, lease_seconds):
+        """Claims the lowest pending or expired unit; (lo, hi) or None."""
+        now = time.time()
+        with self.locked():
+            r = self.db.execute(
+                "SELECT lo, hi FROM units WHERE status='pending' "
+                "OR (status='leased' AND lease_until<?) ORDER BY lo LIMIT 1",
+                (now,)
+            ).fetchone()
+            if r:
+                self.db.execute(
+                    "UPDATE units SET status='leased', owner=?, lease_until=?, "
+                    "leases=leases+1 WHERE lo=?",
+                    (owner, now + lease_seconds, r[0])
+                )
+        return r
+
+    def heartbeat(self, owner, lo, lease_seconds):
+        """Extends the lease; False if it expired and went to another worker."""
+        cur = self.db.execute(
+            "UPDATE units SET lease_until=? WHERE lo=? AND owner=? AND status='leased'",
+            (time.time() + lease_seconds, lo, owner)
+        )
+        return cur.rowcount == 1
+
+    def complete(self, owner, lo):
+        self.db.execute(
+            "UPDATE units SET status='done', finished=? WHERE lo=? AND owner=?",
+            (time.time(), lo, owner)
+        )
+
+    def outstanding(self):
+        """Units not yet done (pending or leased)."""
+        return self.db.execute(
+            "SELECT COUNT(*) FROM units WHERE status!='done'"
+        ).fetchone()[0]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,183 @@
+# image_scraper/write_behind.py
+
+import os
+import time
+import errno
+import queue
+import shutil
+import asyncio
+import logging
+import threading
+from metrics import span, count
+
+# errors a synced / network drive raises while it is busy, locked by the
+# sync client or reconnecting
+TRANSIENT = {errno.EACCES, errno.EAGAIN, errno.EBUSY, errno.EIO, errno.ETIMEDOUT}
+RETRY_BASE = 0.5
+RETRY_MAX  = 30.0
+# files a mover thread takes off the queue at once
+BATCH = 32
+# minimum seconds between progress lines
+PROGRESS_EVERY = 30.0
+
+def _move_file(src, dest):
+    """os.replace, or copy + rename when `dest` is on another filesystem; returns bytes moved."""
+    size = os.path.getsize(src)
+    try:
+        os.replace(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        part = f'{dest}.{os.getpid()}.part'
+        try:
+            shutil.copyfile(src, part)
+            os.replace(part, dest)
+        except OSError:
+            try: os.remove(part)
+            except OSError: pass
+            raise
+        os.remove(src)
+    return size
+
+class WriteBehind:
+    """
+    Moves finished images from a local staging directory to the output
+    directory on background threads, so a slow (synced or network) drive
+    never holds up the downloads. Staged files already carry their final
+    name: whatever a crash or a failed move leaves behind is moved by
+    recover() on the next start. The queue is bounded at `depth` files;
+    once the drive falls that far behind, submit() waits.
+    """
+    def __init__(self, staging, output, depth=256, workers=2, retries=5):
+        os.makedirs(staging, exist_ok=True)
+        self.staging  = staging
+        self.output   = output
+        self.retries  = retries
+        self.queue    = queue.Queue(maxsize=max(1, depth))
+        self.lock     = threading.Lock()
+        self.moved    = 0
+        self.bytes    = 0
+        self.failed   = 0
+        self.reported = time.monotonic()
+        self.threads  = [
+            threading.Thread(target=self._run, name=f'write-behind-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self.threads:
+            t.start()
+
+    def recover(self):
+        """Queues staged files an earlier run did not get to move."""
+        names = [fn for fn in os.listdir(self.staging)
+                 if not fn.startswith('tmp_') and not fn.endswith('.part')]
+        if names:
+            logging.info(f"write-behind: moving {len(names)} files left in {self.staging}")
+        for fn in names:
+            self.queue.put((os.path.join(self.staging, fn), os.path.join(self.output, fn), None))
+
+    async def submit(self, path, dest, on_done=None):
+        """
+        Renames `path` (in staging) to dest's name and queues the move to
+        `dest`; `on_done()` runs on the mover thread once `dest` is in place.
+        """
+        staged = os.path.join(self.staging, os.path.basename(dest))
+        os.replace(path, staged)
+        item = (staged, dest, on_done)
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                count('move_backpressure')
+                await asyncio.sleep(0.05)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is not None:
+                    self._move(*item)
+                self.queue.task_done()
+            self._progress()
+            if batch[-1] is None:
+                return
+
+    def _move(self, src, dest, on_done):
+        for attempt in range(self.retries + 1):
+            try:
+                with span('move') as s:
+                    s.bytes = _move_file(src, dest)
+                with self.lock:
+                    self.moved += 1
+                    self.bytes += s.bytes
+                if on_done is not None:
+                    try:
+                        on_done()
+                    except Exception as e:
+                        logging.warning(f"write-behind: callback for {dest} failed: {e}")
+                return
+            except FileNotFoundError:
+                if os.path.exists(dest):
+                    # another process's recover() got to it first
+                    return
+                err = 'staged file missing'
+                break
+            except OSError as e:
+                err = str(e)
+                if e.errno not in TRANSIENT or attempt == self.retries:
+                    break
+                count('move_retry')
+                time.sleep(min(RETRY_MAX, RETRY_BASE * 2 ** attempt))
+        count('move_failed')
+        with self.lock:
+            self.failed += 1
+        logging.warning(f"write-behind: {src} -> {dest} failed ({err}); left in staging")
+
+    def _progress(self, force=False):
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.reported < PROGRESS_EVERY:
+                return
+            self.reported = now
+            moved, nbytes, failed = self.moved, self.bytes, self.failed
+        logging.info(
+            f"write-behind: {moved} files ({nbytes / 1e6:.1f} MB) moved, "
+            f"{self.queue.qsize()} queued, {failed} failed"
+        )
+
+    def close(self):
+        """Waits for every queued move, then stops the threads."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+        self._progress(force=True)
+
+_mover = None
+
+def configure_mover(cfg):
+    """Starts the process-wide mover when `staging_dir` is set."""
+    global _mover
+    shutdown_mover()
+    if cfg['staging_dir']:
+        os.makedirs(cfg['output_dir'], exist_ok=True)
+        _mover = WriteBehind(
+            cfg['staging_dir'], cfg['output_dir'],
+            cfg['mover_queue'], cfg['mover_workers'], cfg['mover_retries'],
+        )
+        _mover.recover()
+    return _mover
+
+def shutdown_mover():
+    global _mover
+    if _mover is not None:
+        _mover.close()
+        _mover = None
+
+def get_mover():
+    return _mover